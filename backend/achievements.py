@@ -0,0 +1,156 @@
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import select, insert, func, exists, or_
+from models import Student, ScoreSnapshot, ScoreHistory, Achievement
+from config import settings
+
+# Достижения студентов.
+# Правила проверяются при каждом снимке баллов (ingest.py, в транзакции
+# переноса) и только по разнице с предыдущим снимком: кто поднялся на
+# ACHIEVEMENT_MIN_RISE мест и больше, кто пересёк порог баллов, кто
+# очередную неделю подряд держится в топе. Найденное записывается в
+# achievements вместе с готовым текстом, запрос ленты только читает таблицу.
+
+POSITION = "position"
+BADGE = "badge"
+STREAK = "streak"
+
+
+def plural(n: int, one: str, few: str, many: str) -> str:
+    """Форма слова для числа: 1 позицию, 2 позиции, 5 позиций"""
+    if n % 100 in range(11, 20):
+        return many
+    if n % 10 == 1:
+        return one
+    if n % 10 in (2, 3, 4):
+        return few
+    return many
+
+
+def _display_name(first_name, last_name) -> str:
+    return f"{first_name or ''} {last_name or ''}".strip()
+
+
+def _points(value: float) -> str:
+    # Дробное число — всегда «балла»: 4.5 балла
+    return plural(int(value), "балл", "балла", "баллов") if value.is_integer() else "балла"
+
+
+def _verb(patronymic, masculine: str, feminine: str) -> str:
+    return feminine if patronymic and patronymic.endswith("на") else masculine
+
+
+def _previous_snapshot(conn, snapshot_id: int):
+    return conn.execute(
+        select(ScoreSnapshot.id, ScoreSnapshot.taken_at)
+        .where(ScoreSnapshot.id < snapshot_id)
+        .order_by(ScoreSnapshot.id.desc())
+        .limit(1)
+    ).first()
+
+
+def _changes(conn, snapshot_id: int, previous_id: int, *conditions):
+    """Студенты снимка snapshot_id со значениями из предыдущего снимка"""
+    current = ScoreHistory.__table__.alias("cur")
+    previous = ScoreHistory.__table__.alias("prev")
+    return conn.execute(
+        select(
+            current.c.login, current.c.position, current.c.study_score,
+            previous.c.position.label("previous_position"),
+            previous.c.study_score.label("previous_score"),
+            Student.first_name, Student.last_name, Student.patronymic,
+        )
+        .join(previous, previous.c.login == current.c.login)
+        .join(Student, Student.login == current.c.login)
+        .where(current.c.snapshot_id == snapshot_id, previous.c.snapshot_id == previous_id,
+               *(condition(current.c, previous.c) for condition in conditions))
+    ).all()
+
+
+def _rises(conn, snapshot_id: int, previous_id: int):
+    rows = _changes(conn, snapshot_id, previous_id,
+                    lambda cur, prev: prev.position - cur.position >= settings.ACHIEVEMENT_MIN_RISE)
+    for row in rows:
+        gained = row.previous_position - row.position
+        yield row.login, POSITION, gained, (
+            f"{_display_name(row.first_name, row.last_name)} "
+            f"{_verb(row.patronymic, 'поднялся', 'поднялась')} на {gained} "
+            f"{plural(gained, 'позицию', 'позиции', 'позиций')}."
+        )
+
+
+def _thresholds(conn, snapshot_id: int, previous_id: int):
+    thresholds = sorted(settings.ACHIEVEMENT_THRESHOLDS)
+    if not thresholds:
+        return
+    rows = _changes(conn, snapshot_id, previous_id, lambda cur, prev: cur.study_score >= thresholds[0],
+                    lambda cur, prev: or_(prev.study_score.is_(None), prev.study_score < cur.study_score))
+    for row in rows:
+        previous = row.previous_score if row.previous_score is not None else float("-inf")
+        crossed = [value for value in thresholds if previous < value <= row.study_score]
+        if crossed:
+            # Пересёк несколько порогов сразу — одно достижение за старший
+            yield row.login, BADGE, crossed[-1], (
+                f"{_display_name(row.first_name, row.last_name)} "
+                f"{_verb(row.patronymic, 'набрал', 'набрала')} {crossed[-1]:g} {_points(crossed[-1])}."
+            )
+
+
+def _streak_start(conn, login: str) -> Optional[datetime]:
+    """Время первого снимка текущей серии, в которой студент не выходил из топа"""
+    top = settings.ACHIEVEMENT_TOP
+    in_top = exists().where(
+        ScoreHistory.snapshot_id == ScoreSnapshot.id,
+        ScoreHistory.login == login,
+        ScoreHistory.position <= top,
+    )
+    broken = conn.execute(select(func.max(ScoreSnapshot.taken_at)).where(~in_top)).scalar()
+    query = select(func.min(ScoreSnapshot.taken_at))
+    if broken is not None:
+        query = query.where(ScoreSnapshot.taken_at > broken)
+    return conn.execute(query).scalar()
+
+
+def _streaks(conn, snapshot_id: int, taken_at: datetime, previous_at: datetime):
+    top = settings.ACHIEVEMENT_TOP
+    rows = conn.execute(
+        select(ScoreHistory.login, Student.first_name, Student.last_name, Student.patronymic)
+        .join(Student, Student.login == ScoreHistory.login)
+        .where(ScoreHistory.snapshot_id == snapshot_id, ScoreHistory.position <= top)
+    ).all()
+    for row in rows:
+        start = _streak_start(conn, row.login)
+        if start is None:
+            continue
+        weeks = (taken_at - start) // timedelta(weeks=1)
+        previous_weeks = (previous_at - start) // timedelta(weeks=1) if previous_at >= start else 0
+        # Достижение — когда серия дошла до очередной полной недели
+        if weeks >= settings.ACHIEVEMENT_STREAK_WEEKS and weeks > previous_weeks:
+            yield row.login, STREAK, weeks, (
+                f"{_display_name(row.first_name, row.last_name)} удерживает топ-{top} "
+                f"уже {weeks} {plural(weeks, 'неделю', 'недели', 'недель')}."
+            )
+
+
+def evaluate_achievements(conn, snapshot_id: int) -> int:
+    """Находит достижения снимка snapshot_id по сравнению с предыдущим (синхронное соединение)"""
+    taken_at = conn.execute(
+        select(ScoreSnapshot.taken_at).where(ScoreSnapshot.id == snapshot_id)
+    ).scalar()
+    previous = _previous_snapshot(conn, snapshot_id)
+    if previous is None:
+        # Первый снимок — сравнивать не с чем
+        return 0
+
+    found = [
+        *_rises(conn, snapshot_id, previous.id),
+        *_thresholds(conn, snapshot_id, previous.id),
+        *_streaks(conn, snapshot_id, taken_at, previous.taken_at),
+    ]
+    if found:
+        conn.execute(insert(Achievement), [
+            {"login": login, "kind": kind, "value": value, "text": text,
+             "snapshot_id": snapshot_id, "created_at": taken_at}
+            for login, kind, value, text in found
+        ])
+    return len(found)
@@ -0,0 +1,308 @@
+"""
+Нагрузочный тест API.
+
+    python backend/benchmark.py                                  # в процессе, через ASGI
+    python backend/benchmark.py --url http://127.0.0.1:8000      # по HTTP к запущенному серверу
+    python backend/benchmark.py --output results.json --compare previous.json
+    python backend/benchmark.py --serialization                  # построение и кодирование ответа
+
+Для каждого сценария выполняется --requests запросов с --concurrency
+параллельными клиентами; в отчёт попадают пропускная способность и
+перцентили задержки p50/p95/p99. Результаты сохраняются в JSON вместе
+с хэшем коммита, чтобы сравнивать их между версиями.
+
+Данные для теста: python backend/generate_students.py 100000
+"""
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+from urllib.parse import urlencode
+import httpx
+
+# Сравнение с предыдущим прогоном: замедление p95 больше порога считается регрессией
+REGRESSION_THRESHOLD = 0.2
+
+
+def leaderboard_scenarios(school: str, group: str, search: str):
+    """Все сочетания фильтров и сортировок лидерборда"""
+    filters = {
+        "all": {},
+        "search": {"search": search},
+        "school": {"school": school},
+        "group": {"group": group},
+        "score": {"min_score": 4.0, "max_score": 4.5},
+        "combined": {"school": school, "min_score": 3.5},
+    }
+    scenarios = []
+    for filter_name, params in filters.items():
+        for sort_by in ("score", "group", "school", "year"):
+            for sort_order in ("desc", "asc"):
+                query = {**params, "sort_by": sort_by, "sort_order": sort_order, "limit": 100}
+                scenarios.append((
+                    f"leaderboard[{filter_name},{sort_by},{sort_order}]",
+                    "/api/leaderboard?" + urlencode(query),
+                ))
+    scenarios.append(("leaderboard[full]", "/api/leaderboard"))
+    return scenarios
+
+
+def percentile(values, fraction: float) -> float:
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, round(fraction * (len(values) - 1))))
+    return values[index]
+
+
+async def run_scenario(client: httpx.AsyncClient, url: str, requests: int, concurrency: int,
+                       before_request=None) -> dict:
+    latencies = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            if before_request is not None:
+                before_request()
+            started = time.perf_counter()
+            response = await client.get(url)
+            await response.aread()
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "url": url,
+        "requests": requests,
+        "errors": errors,
+        "seconds": round(elapsed, 4),
+        "rps": round(requests / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+@asynccontextmanager
+async def make_client(url: str = None):
+    if url:
+        async with httpx.AsyncClient(base_url=url, timeout=60) as client:
+            yield client
+        return
+
+    # В процессе: приложение вызывается напрямую, без сети; lifespan запускаем сами
+    import main
+    async with main.lifespan(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=60) as client:
+            yield client
+
+
+async def pick_sample(client: httpx.AsyncClient) -> dict:
+    """Берёт из данных реальные школу, группу, логин и строку поиска для запросов"""
+    response = await client.get("/api/leaderboard", params={"limit": 1})
+    response.raise_for_status()
+    rows = response.json()
+    if not rows:
+        raise SystemExit("Таблица students пуста — сгенерируйте данные: python backend/generate_students.py 100000")
+    row = rows[0]
+    return {
+        "login": row["login"],
+        "school": row["Школа"],
+        "group": row["Группа"],
+        "search": row["ФИО"].split()[0][:4],
+    }
+
+
+async def run(args) -> dict:
+    results = {}
+    async with make_client(args.url) as client:
+        sample = await pick_sample(client)
+
+        # Сессия пользователя, связанного со студентом, — для /api/user/rank
+        await client.post("/auth/test-login", json={
+            "first_name": "Benchmark",
+            "last_name": "User",
+            "email": f"{sample['login']}@tpu.ru",
+            "tpu_user_id": "1",
+        })
+
+        scenarios = leaderboard_scenarios(sample["school"], sample["group"], sample["search"])
+        scenarios += [
+            ("user_rank", "/api/user/rank"),
+            ("profile", f"/api/profile/{sample['login']}"),
+            ("top_weekly", "/api/top-weekly"),
+            ("top_monthly", "/api/top-weekly?period=month"),
+        ]
+        if args.only:
+            scenarios = [(name, url) for name, url in scenarios if args.only in name]
+
+        before_request = None
+        if args.cold:
+            if args.url:
+                raise SystemExit("--cold работает только в процессе (без --url)")
+            from response_cache import response_cache
+            before_request = response_cache.clear
+
+        for name, url in scenarios:
+            # Прогрев: первый запрос строит индексы и кэши
+            await client.get(url)
+            results[name] = await run_scenario(client, url, args.requests, args.concurrency, before_request)
+            r = results[name]
+            print(
+                f"{name:45} {r['rps']:9.1f} rps  p50 {r['p50_ms']:8.2f}  "
+                f"p95 {r['p95_ms']:8.2f}  p99 {r['p99_ms']:8.2f} ms"
+                + (f"  ошибок {r['errors']}" if r["errors"] else "")
+            )
+
+    return results
+
+
+async def serialization_benchmark(repeat: int) -> dict:
+    """
+    Сравнивает построение полного лидерборда без кэша:
+    ORM-объекты + проверка StudentResponse + jsonable_encoder/json против
+    выборки колонок и прямого кодирования (encode_json).
+    """
+    from typing import List
+    from fastapi.encoders import jsonable_encoder
+    from pydantic import TypeAdapter
+    from sqlalchemy import select, func
+    import main
+    from database import SessionLocal
+    from models import Student
+    from rank_index import partition_ranks
+    from response_cache import encode_json, orjson
+    from routes.leaderboard import build_leaderboard
+    from schemas import StudentResponse
+
+    adapter = TypeAdapter(List[StudentResponse])
+
+    async def orm_path(db):
+        place = func.rank().over(order_by=(Student.study_score.desc().nulls_last(), Student.login))
+        rows = (await db.execute(
+            select(Student, place).order_by(Student.study_score.desc().nulls_last(), Student.login)
+        )).all()
+        await partition_ranks.ensure(db)
+        data = []
+        for s, position in rows:
+            school_rank, group_rank, year_rank = partition_ranks.lookup(s.login)
+            data.append({
+                "Место": position,
+                "ФИО": f"{s.last_name} {s.first_name} {s.patronymic}".strip(),
+                "Школа": s.direction_name or s.faculty or "Не указано",
+                "Группа": s.student_group,
+                "Счет_баллов": float(s.study_score) if s.study_score is not None else 0.0,
+                "login": s.login,
+                "Место_в_школе": school_rank,
+                "Место_в_группе": group_rank,
+                "Место_на_курсе": year_rank,
+            })
+        validated = adapter.validate_python(data)
+        return json.dumps(jsonable_encoder(validated), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    async def fast_path(db):
+        data, _ = await build_leaderboard(db, None, None, None, None, None, "score", True)
+        return encode_json(data)
+
+    results = {}
+    async with main.lifespan(main.app):
+        for name, build in (("orm_pydantic_json", orm_path), ("columns_" + ("orjson" if orjson else "json"), fast_path)):
+            timings = []
+            for _ in range(repeat + 1):
+                async with SessionLocal() as db:
+                    started = time.perf_counter()
+                    body = await build(db)
+                    timings.append(time.perf_counter() - started)
+            timings = sorted(timings[1:])  # первый прогон — прогрев
+            results[name] = {
+                "bytes": len(body),
+                "p50_ms": round(percentile(timings, 0.50) * 1000, 3),
+                "p95_ms": round(percentile(timings, 0.95) * 1000, 3),
+            }
+            print(f"{name:45} {len(body):10d} байт  p50 {results[name]['p50_ms']:8.2f}  p95 {results[name]['p95_ms']:8.2f} ms")
+
+    slow, fast = (r["p50_ms"] for r in results.values())
+    if fast:
+        print(f"Ускорение: {slow / fast:.1f}x")
+    return results
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: dict, previous_path: str) -> int:
+    """Печатает изменение p95 относительно прошлого прогона; возвращает число регрессий"""
+    with open(previous_path, encoding="utf-8") as f:
+        previous = json.load(f)
+
+    regressions = 0
+    print(f"\nСравнение с {previous_path} (коммит {previous.get('commit')}):")
+    for name, result in results.items():
+        old = previous["results"].get(name)
+        if not old or not old["p95_ms"]:
+            continue
+        change = (result["p95_ms"] - old["p95_ms"]) / old["p95_ms"]
+        mark = ""
+        if change > REGRESSION_THRESHOLD:
+            mark = "  РЕГРЕССИЯ"
+            regressions += 1
+        print(f"{name:45} p95 {old['p95_ms']:8.2f} -> {result['p95_ms']:8.2f} ms ({change:+.0%}){mark}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Нагрузочный тест API")
+    parser.add_argument("--url", help="адрес запущенного сервера; по умолчанию — в процессе через ASGI")
+    parser.add_argument("--requests", type=int, default=200, help="запросов на сценарий")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--only", help="запускать только сценарии, содержащие подстроку")
+    parser.add_argument("--cold", action="store_true", help="очищать кэш ответов перед каждым запросом")
+    parser.add_argument("--output", help="сохранить результаты в JSON")
+    parser.add_argument("--compare", help="JSON предыдущего прогона для сравнения")
+    parser.add_argument("--serialization", action="store_true",
+                        help="сравнить способы построения ответа лидерборда (в процессе)")
+    args = parser.parse_args(argv)
+
+    if args.serialization:
+        results = asyncio.run(serialization_benchmark(args.requests // 20 or 1))
+    else:
+        results = asyncio.run(run(args))
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.utcnow().isoformat(),
+        "mode": "serialization" if args.serialization else "http" if args.url else "asgi",
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "cold": args.cold,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\nРезультаты сохранены в {args.output}")
+
+    if args.compare:
+        return 1 if compare(results, args.compare) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
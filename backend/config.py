@@ -12,6 +12,22 @@ class Settings:
     DB_NAME           = os.getenv("DB_NAME")
     DB_PASSWORD       = os.getenv("DB_PASSWORD")
     DB_PORT           = os.getenv("DB_PORT")
+
+    # Postgres (asyncpg), если заданы DB_*, иначе локальный SQLite (aiosqlite)
+    DATABASE_URL      = os.getenv("DATABASE_URL") or (
+        f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+        if DB_HOST else "sqlite+aiosqlite:///./backend/database.db"
+    )
+
+    DB_POOL_SIZE      = int(os.getenv("DB_POOL_SIZE", "10"))
+    DB_MAX_OVERFLOW   = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+    DB_POOL_TIMEOUT   = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+    # SQLite: WAL позволяет читать во время записи, busy_timeout — ждать блокировку, а не падать
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    SQLITE_MMAP_SIZE       = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+    SQLITE_CACHE_SIZE_KB   = int(os.getenv("SQLITE_CACHE_SIZE_KB", str(64 * 1024)))
+    SQLITE_SYNCHRONOUS     = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
     
     # TPU OAuth Settings
 
@@ -19,12 +35,65 @@ class Settings:
     TPU_CLIENT_SECRET = os.getenv("TPU_CLIENT_SECRET", "your_client_secret")
     TPU_API_KEY       = os.getenv("TPU_API_KEY", "your_api_key")
     
-    TPU_AUTH_URL      = "https://oauth.tpu.ru/authorize"
-    TPU_TOKEN_URL     = "https://oauth.tpu.ru/access_token"
-    TPU_USER_INFO_URL = "https://api.tpu.ru/v2/auth/user"
-    TPU_LOGOUT_URL    = "https://oauth.tpu.ru/auth/logout"
+    # Адреса можно переопределить, например, на локальный oauth_stub.py
+    TPU_AUTH_URL      = os.getenv("TPU_AUTH_URL", "https://oauth.tpu.ru/authorize")
+    TPU_TOKEN_URL     = os.getenv("TPU_TOKEN_URL", "https://oauth.tpu.ru/access_token")
+    TPU_USER_INFO_URL = os.getenv("TPU_USER_INFO_URL", "https://api.tpu.ru/v2/auth/user")
+    TPU_LOGOUT_URL    = os.getenv("TPU_LOGOUT_URL", "https://oauth.tpu.ru/auth/logout")
     
     SECRET_KEY        = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
-    TPU_REDIRECT_URI  = "http://localhost:8000/auth/callback"
+    TPU_REDIRECT_URI  = os.getenv("TPU_REDIRECT_URI", "http://localhost:8000/auth/callback")
+
+    # HTTP client for TPU OAuth
+
+    TPU_HTTP_TIMEOUT         = float(os.getenv("TPU_HTTP_TIMEOUT", "5"))
+    TPU_HTTP_CONNECT_TIMEOUT = float(os.getenv("TPU_HTTP_CONNECT_TIMEOUT", "2"))
+    TPU_HTTP_MAX_CONNECTIONS = int(os.getenv("TPU_HTTP_MAX_CONNECTIONS", "50"))
+    TPU_HTTP_RETRIES         = int(os.getenv("TPU_HTTP_RETRIES", "2"))
+    TPU_HTTP_BACKOFF         = float(os.getenv("TPU_HTTP_BACKOFF", "0.2"))
+    TPU_USER_INFO_TTL        = float(os.getenv("TPU_USER_INFO_TTL", "60"))
+
+    # Background token refresh: токены, истекающие в ближайшие TOKEN_REFRESH_AHEAD секунд
+
+    TOKEN_REFRESH_ENABLED     = os.getenv("TOKEN_REFRESH_ENABLED", "1") == "1"
+    TOKEN_REFRESH_INTERVAL    = float(os.getenv("TOKEN_REFRESH_INTERVAL", "60"))
+    TOKEN_REFRESH_AHEAD       = float(os.getenv("TOKEN_REFRESH_AHEAD", "600"))
+    TOKEN_REFRESH_BATCH       = int(os.getenv("TOKEN_REFRESH_BATCH", "200"))
+    TOKEN_REFRESH_CONCURRENCY = int(os.getenv("TOKEN_REFRESH_CONCURRENCY", "8"))
+    # Доля интервала: разброс паузы между проходами и задержки старта каждого обновления
+    TOKEN_REFRESH_JITTER      = float(os.getenv("TOKEN_REFRESH_JITTER", "0.2"))
+
+    # Response cache settings
+
+    RESPONSE_CACHE_SIZE      = int(os.getenv("RESPONSE_CACHE_SIZE", "512"))
+    RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+    # Leaderboard engine: 'sql' — запрос к БД, 'snapshot' — колоночный снимок в памяти (нужен numpy)
+
+    LEADERBOARD_ENGINE       = os.getenv("LEADERBOARD_ENGINE", "sql")
+
+    # Score history settings
+
+    SCORE_HISTORY_DAYS       = int(os.getenv("SCORE_HISTORY_DAYS", "120"))
+
+    # Achievements: подъём на N мест, удержание топа K недель, пороги баллов
+
+    ACHIEVEMENT_MIN_RISE     = int(os.getenv("ACHIEVEMENT_MIN_RISE", "5"))
+    ACHIEVEMENT_TOP          = int(os.getenv("ACHIEVEMENT_TOP", "10"))
+    ACHIEVEMENT_STREAK_WEEKS = int(os.getenv("ACHIEVEMENT_STREAK_WEEKS", "1"))
+    ACHIEVEMENT_THRESHOLDS   = [float(value) for value in os.getenv("ACHIEVEMENT_THRESHOLDS", "4.0,4.5").split(",") if value]
+
+    # Current user cache and sessions
+
+    USER_CACHE_SIZE          = int(os.getenv("USER_CACHE_SIZE", "1024"))
+    USER_CACHE_TTL           = float(os.getenv("USER_CACHE_TTL", "60"))
+    # 'cookie' — данные сессии в подписанной cookie, 'server' — в таблице server_sessions
+    SESSION_STORE            = os.getenv("SESSION_STORE", "cookie")
+    SESSION_MAX_AGE          = int(os.getenv("SESSION_MAX_AGE", str(14 * 24 * 60 * 60)))
+
+    # Rank change stream (SSE)
+
+    RANK_STREAM_POLL_INTERVAL = float(os.getenv("RANK_STREAM_POLL_INTERVAL", "2"))
+    RANK_STREAM_HEARTBEAT     = float(os.getenv("RANK_STREAM_HEARTBEAT", "15"))
 
 settings = Settings()
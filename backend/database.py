@@ -1,23 +1,61 @@
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-import os
-from dotenv import load_dotenv
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.orm import declarative_base
+from config import settings
 
-load_dotenv()
+DATABASE_URL = settings.DATABASE_URL
+_url = make_url(DATABASE_URL)
 
-# DATABASE_URL = f"postgresql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
-DATABASE_URL = "sqlite:///./backend/database.db"  # <-- Используем SQLite файл
+if _url.get_backend_name() == "sqlite":
+    engine_options = {}
+else:
+    engine_options = {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_pre_ping": True,
+    }
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})  # check_same_thread для SQLite
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Асинхронный движок для приложения
+engine = create_async_engine(DATABASE_URL, **engine_options)
+SessionLocal = async_sessionmaker(engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+# Синхронный движок той же БД для консольных утилит (загрузка данных и т.п.)
+sync_engine = create_engine(_url.set(drivername=_url.get_backend_name()), **engine_options)
+
+
+
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    """Настройки SQLite для параллельной работы нескольких воркеров и ingest.py"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}")
+    # Отрицательное значение — размер в килобайтах, а не в страницах
+    cursor.execute(f"PRAGMA cache_size=-{settings.SQLITE_CACHE_SIZE_KB}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+
+def _unicode_lower(value):
+    return value.lower() if isinstance(value, str) else value
+
+
+def _sqlite_functions(dbapi_connection, connection_record):
+    """Встроенный lower() в SQLite меняет регистр только у ASCII — заменяем на юникодный"""
+    dbapi_connection.create_function("lower", 1, _unicode_lower, deterministic=True)
+
+
+if _url.get_backend_name() == "sqlite":
+    for _engine in (engine.sync_engine, sync_engine):
+        event.listen(_engine, "connect", _sqlite_pragmas)
+        event.listen(_engine, "connect", _sqlite_functions)
 
 Base = declarative_base()
 
-# Добавьте эту функцию
-def get_db():
-    db = SessionLocal()
-    try:
+
+async def get_db():
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
@@ -1,17 +1,23 @@
 from fastapi import Depends, HTTPException, Request
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from database import get_db
 from models import User
+from user_cache import user_cache
 
-def get_current_user(request: Request, db: Session = Depends(get_db)):
+async def get_current_user(request: Request, db: AsyncSession = Depends(get_db)):
     """Зависимость для получения текущего пользователя"""
     user_info = request.session.get("user_info")
     if not user_info:
         raise HTTPException(status_code=401, detail="Не авторизован")
     
-    user = db.query(User).filter(User.id == user_info["id"]).first()
+    user = user_cache.get(user_info["id"])
+    if user:
+        return user
+
+    user = await db.get(User, user_info["id"])
     if not user:
         raise HTTPException(status_code=401, detail="Пользователь не найден")
+    user_cache.put(user)
     
     return user
 
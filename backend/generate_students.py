@@ -0,0 +1,160 @@
+"""
+Генератор синтетических студентов для нагрузочного тестирования.
+
+    python backend/generate_students.py 100000
+    python backend/generate_students.py 1000000 --seed 7 --output students.ndjson
+
+Без --output строки сразу загружаются в students через ingest.py (с удалением
+студентов, которых нет в сгенерированной выгрузке; если так удалится большая
+часть таблицы, например настоящие студенты, нужен --force). С одинаковым --seed
+получается одна и та же выгрузка, поэтому результаты benchmark.py можно
+сравнивать между коммитами.
+"""
+import argparse
+import csv
+import json
+import random
+import sys
+from sqlalchemy.exc import DBAPIError
+from ingest import ingest, detect_format, SuspiciousLoad, DEFAULT_BATCH_SIZE
+
+MALE_FIRST_NAMES = [
+    "Александр", "Алексей", "Андрей", "Артём", "Владимир", "Дмитрий", "Егор", "Иван",
+    "Илья", "Кирилл", "Максим", "Михаил", "Никита", "Павел", "Роман", "Сергей",
+]
+FEMALE_FIRST_NAMES = [
+    "Алина", "Анастасия", "Анна", "Дарья", "Екатерина", "Елена", "Ксения", "Мария",
+    "Наталья", "Ольга", "Полина", "Светлана", "Софья", "Татьяна", "Юлия", "Яна",
+]
+# Мужская форма; женская получается окончанием -а
+LAST_NAMES = [
+    "Иванов", "Смирнов", "Кузнецов", "Попов", "Васильев", "Петров", "Соколов", "Михайлов",
+    "Новиков", "Фёдоров", "Морозов", "Волков", "Алексеев", "Лебедев", "Семёнов", "Егоров",
+    "Павлов", "Козлов", "Степанов", "Николаев", "Орлов", "Андреев", "Макаров", "Никитин",
+]
+# Основа отчества; окончание -ич или -на
+PATRONYMIC_ROOTS = [
+    "Александров", "Алексеев", "Андреев", "Владимиров", "Дмитриев", "Иванов",
+    "Михайлов", "Николаев", "Павлов", "Сергеев",
+]
+
+# Школа ТПУ -> (направления, буква шифра группы)
+SCHOOLS = {
+    "ИШИТР": (["Программная инженерия", "Информатика и вычислительная техника"], "8"),
+    "ИШНКБ": (["Информационная безопасность", "Приборостроение"], "1"),
+    "ИШЭ": (["Электроэнергетика", "Теплоэнергетика"], "5"),
+    "ИШПР": (["Нефтегазовое дело", "Прикладная геология"], "2"),
+    "ИШНПТ": (["Химическая технология", "Материаловедение"], "4"),
+    "ИЯТШ": (["Ядерная физика и технологии", "Техническая физика"], "0"),
+    "БШ": (["Менеджмент", "Экономика"], "3"),
+}
+GROUPS_PER_DIRECTION = 4
+
+TRANSLIT = str.maketrans({
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ё": "e", "ж": "z",
+    "з": "z", "и": "i", "й": "i", "к": "k", "л": "l", "м": "m", "н": "n", "о": "o",
+    "п": "p", "р": "r", "с": "s", "т": "t", "у": "u", "ф": "f", "х": "h", "ц": "c",
+    "ч": "c", "ш": "s", "щ": "s", "ы": "y", "э": "e", "ю": "u", "я": "a",
+})
+
+
+def _score(rng: random.Random, study_year: int):
+    """Средний балл: смещённое к 4 распределение, у части студентов баллов нет"""
+    if rng.random() < 0.02:
+        return None
+    score = rng.gauss(4.0 + 0.05 * (study_year - 1), 0.45)
+    return round(min(5.0, max(2.5, score)), 2)
+
+
+def generate(count: int, seed: int = 42):
+    """Генерирует count строк выгрузки в формате колонок Student"""
+    rng = random.Random(seed)
+    logins = {}
+
+    directions = []
+    for faculty, (names, code) in SCHOOLS.items():
+        for index, name in enumerate(names):
+            directions.append((faculty, name, f"{code}{chr(ord('А') + index)}"))
+
+    for number in range(1, count + 1):
+        female = rng.random() < 0.45
+        first_name = rng.choice(FEMALE_FIRST_NAMES if female else MALE_FIRST_NAMES)
+        last_name = rng.choice(LAST_NAMES) + ("а" if female else "")
+        patronymic = rng.choice(PATRONYMIC_ROOTS) + ("на" if female else "ич")
+
+        faculty, direction, code = rng.choice(directions)
+        study_year = rng.choices([1, 2, 3, 4], weights=[30, 27, 23, 20])[0]
+        admission = 4 - study_year + 1  # последняя цифра года поступления
+        group = f"{code}{admission}{rng.randint(1, GROUPS_PER_DIRECTION)}"
+
+        # Логин ТПУ: инициалы латиницей и порядковый номер
+        initials = (first_name[0] + patronymic[0] + last_name[0]).lower().translate(TRANSLIT)
+        logins[initials] = logins.get(initials, 0) + 1
+
+        yield {
+            "login": f"{initials}{logins[initials]}",
+            "someone_id": f"S{number:07d}",
+            "first_name": first_name,
+            "last_name": last_name,
+            "patronymic": patronymic,
+            "student_group": group,
+            "direction_name": direction,
+            "study_year": study_year,
+            "faculty": faculty,
+            "study_score": _score(rng, study_year),
+            "debt_count": min(6, int(rng.expovariate(2.5))),
+        }
+
+
+def write_rows(rows, path: str):
+    fmt = detect_format(path)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        if fmt == "csv":
+            writer = None
+            for row in rows:
+                if writer is None:
+                    writer = csv.DictWriter(f, fieldnames=list(row))
+                    writer.writeheader()
+                writer.writerow(row)
+        elif fmt == "ndjson":
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        else:
+            f.write("[\n")
+            for index, row in enumerate(rows):
+                f.write((",\n" if index else "") + json.dumps(row, ensure_ascii=False))
+            f.write("\n]\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Генерация синтетических студентов")
+    parser.add_argument("count", type=int, help="число студентов (10 000 — 1 000 000)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="записать выгрузку в файл (.csv, .ndjson, .json) вместо загрузки в базу")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--force", action="store_true", help="заменить студентов в базе, даже если удаляется большинство")
+    args = parser.parse_args(argv)
+
+    rows = generate(args.count, args.seed)
+    if args.output:
+        write_rows(rows, args.output)
+        print(f"Записано {args.count} строк в {args.output}")
+        return 0
+
+    try:
+        stats = ingest(rows, batch_size=args.batch_size, force=args.force)
+    except SuspiciousLoad as e:
+        print(f"Загрузка прервана: {e}; students не изменена (--force — заменить всё равно)", file=sys.stderr)
+        return 1
+    except DBAPIError as e:
+        print(f"Загрузка прервана: ошибка базы данных: {e.orig}", file=sys.stderr)
+        return 1
+    print(
+        f"Загружено {stats['loaded']} строк за {stats['seconds']:.1f} с "
+        f"({stats['rows_per_second']:.0f} строк/с), версия данных {stats['version']}"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,320 @@
+"""
+Загрузка выгрузки студентов из вуза в таблицу students.
+
+    python backend/ingest.py students.csv
+    python backend/ingest.py students.ndjson --batch-size 10000
+
+Файл читается потоково, строки проверяются по модели Student и пачками
+загружаются в теневую таблицу students_staging. Затем одной транзакцией
+данные переносятся в students (новые добавляются, изменённые обновляются,
+отсутствующие в выгрузке удаляются), поэтому читатели никогда не видят
+частично загруженную таблицу. В той же транзакции сохраняется снимок
+баллов для истории (см. score_history.py), находятся новые достижения
+(см. achievements.py) и пересчитываются баллы команд (см. team_scores.py).
+
+Если выгрузка пуста, обрезана или удалила бы больше --max-missing студентов,
+перенос не выполняется и students не меняется (--force — перенести всё равно).
+"""
+import argparse
+import csv
+import json
+import sys
+import time
+from sqlalchemy import Table, MetaData, Integer, Float, String, select, delete, func, inspect
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.dialects import postgresql, sqlite
+from database import sync_engine as engine
+from models import Student
+from migrations import require_current, SchemaOutdated
+from score_history import take_snapshot
+from achievements import evaluate_achievements
+from team_scores import refresh_team_scores
+import versioning
+
+STAGING_TABLE = "students_staging"
+DEFAULT_BATCH_SIZE = 5000
+# Доля пропущенных строк или удаляемых студентов, выше которой выгрузка считается битой
+DEFAULT_MAX_MISSING = 0.2
+
+
+class RowError(ValueError):
+    pass
+
+
+class SuspiciousLoad(ValueError):
+    """Выгрузка удалила бы слишком много студентов — скорее всего, она неполная"""
+
+
+# --- ЧТЕНИЕ ВЫГРУЗКИ ---
+
+def _iter_csv(f, delimiter: str):
+    yield from csv.DictReader(f, delimiter=delimiter)
+
+
+def _iter_ndjson(f):
+    for line in f:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def _iter_json_array(f, chunk_size: int = 1 << 16):
+    """Потоковое чтение JSON-массива объектов без загрузки файла целиком"""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    started = False
+
+    for chunk in iter(lambda: f.read(chunk_size), ""):
+        buffer += chunk
+        pos = 0
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos >= len(buffer):
+                break
+            if not started:
+                if buffer[pos] != "[":
+                    raise ValueError("Ожидался JSON-массив")
+                started = True
+                pos += 1
+                continue
+            if buffer[pos] == "]":
+                return
+            try:
+                obj, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # Объект ещё не дочитан
+                break
+            yield obj
+        buffer = buffer[pos:]
+
+    # Файл кончился раньше закрывающей скобки: выгрузка обрезана или битая
+    if buffer.strip(" \t\r\n,"):
+        raise ValueError("JSON-массив обрезан или повреждён: не разобран конец файла")
+    raise ValueError("JSON-массив не закрыт: нет закрывающей ]")
+
+
+def read_rows(f, fmt: str, delimiter: str = ","):
+    if fmt == "csv":
+        return _iter_csv(f, delimiter)
+    if fmt == "ndjson":
+        return _iter_ndjson(f)
+    return _iter_json_array(f)
+
+
+def detect_format(path: str) -> str:
+    if path.endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    if path.endswith(".json"):
+        return "json"
+    return "csv"
+
+
+# --- ПРОВЕРКА СТРОК ---
+
+def _required_columns(conn) -> set:
+    """Обязательные поля: первичный ключ модели и NOT NULL в живой таблице"""
+    required = {column.name for column in Student.__table__.primary_key}
+    for column in inspect(conn).get_columns(Student.__tablename__):
+        if not column["nullable"] and column["default"] is None:
+            required.add(column["name"])
+    return required & set(Student.__table__.columns.keys())
+
+
+def validate_row(raw: dict, required: set) -> dict:
+    """Приводит строку выгрузки к типам колонок Student"""
+    row = {}
+    for column in Student.__table__.columns:
+        value = raw.get(column.name)
+        if isinstance(value, str):
+            value = value.strip()
+        if value == "" or value is None:
+            if column.name in required:
+                raise RowError(f"не заполнено поле {column.name}")
+            row[column.name] = None
+            continue
+
+        try:
+            if isinstance(column.type, Integer):
+                value = int(float(value)) if isinstance(value, str) else int(value)
+            elif isinstance(column.type, Float):
+                value = float(value.replace(",", ".")) if isinstance(value, str) else float(value)
+            else:
+                value = str(value)
+        except (TypeError, ValueError):
+            raise RowError(f"неверное значение {column.name}: {value!r}")
+
+        if isinstance(column.type, String) and column.type.length and len(value) > column.type.length:
+            raise RowError(f"слишком длинное значение {column.name}")
+        row[column.name] = value
+    return row
+
+
+# --- ЗАГРУЗКА ---
+
+def _insert(table):
+    dialect = postgresql if engine.dialect.name == "postgresql" else sqlite
+    return dialect.insert(table)
+
+
+def _upsert(table, source=None):
+    """INSERT ... ON CONFLICT (login) DO UPDATE только для изменившихся строк"""
+    columns = [c.name for c in Student.__table__.columns]
+    stmt = _insert(table)
+    if source is not None:
+        stmt = stmt.from_select(columns, select(*(source.c[name] for name in columns)).where(True))
+
+    updated = [name for name in columns if name != "login"]
+    return stmt.on_conflict_do_update(
+        index_elements=["login"],
+        set_={name: stmt.excluded[name] for name in updated},
+        where=None if source is None else _changed(table, stmt, updated),
+    )
+
+
+def _changed(table, stmt, columns):
+    condition = None
+    for name in columns:
+        differs = table.c[name].is_distinct_from(stmt.excluded[name])
+        condition = differs if condition is None else condition | differs
+    return condition
+
+
+def _check_swap(conn, students, staging, stats: dict, max_missing: float):
+    """Не даёт пустой или обрезанной выгрузке стереть таблицу students"""
+    if stats["loaded"] == 0:
+        raise SuspiciousLoad("не загружено ни одной строки (проверьте формат и --delimiter)")
+
+    read = stats["loaded"] + stats["skipped"]
+    if stats["skipped"] > read * max_missing:
+        raise SuspiciousLoad(f"пропущено {stats['skipped']} из {read} строк")
+
+    total = conn.execute(select(func.count()).select_from(students)).scalar()
+    missing = conn.execute(
+        select(func.count()).select_from(students)
+        .where(students.c.login.not_in(select(staging.c.login)))
+    ).scalar()
+    if missing > total * max_missing:
+        raise SuspiciousLoad(f"будет удалено {missing} из {total} студентов")
+
+
+def ingest(rows, batch_size: int = DEFAULT_BATCH_SIZE, keep_missing: bool = False,
+           strict: bool = False, force: bool = False, max_missing: float = DEFAULT_MAX_MISSING,
+           log=print) -> dict:
+    """Загружает строки в students через теневую таблицу"""
+    with engine.connect() as conn:
+        require_current(conn)
+
+    staging = Student.__table__.to_metadata(MetaData(), name=STAGING_TABLE)
+    students = Table(Student.__tablename__, MetaData(), autoload_with=engine)
+
+    with engine.begin() as conn:
+        staging.drop(conn, checkfirst=True)
+        staging.create(conn)
+        required = _required_columns(conn)
+
+    stats = {"loaded": 0, "skipped": 0}
+    started = time.perf_counter()
+    # Пачка по логину: повторы внутри выгрузки схлопываются, побеждает последняя строка
+    batch = {}
+
+    def flush():
+        with engine.begin() as conn:
+            conn.execute(_upsert(staging), list(batch.values()))
+        stats["loaded"] += len(batch)
+        batch.clear()
+        elapsed = time.perf_counter() - started
+        log(f"  {stats['loaded']} строк, {stats['loaded'] / elapsed:.0f} строк/с")
+
+    try:
+        for line_no, raw in enumerate(rows, 1):
+            try:
+                row = validate_row(raw, required)
+            except RowError as e:
+                if strict:
+                    raise RowError(f"строка {line_no}: {e}")
+                stats["skipped"] += 1
+                if stats["skipped"] <= 20:
+                    log(f"  пропущена строка {line_no}: {e}")
+                continue
+
+            batch[row["login"]] = row
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+
+        # Переносим данные одной транзакцией
+        with engine.begin() as conn:
+            if not keep_missing:
+                if not force:
+                    _check_swap(conn, students, staging, stats, max_missing)
+                conn.execute(
+                    delete(students).where(students.c.login.not_in(select(staging.c.login)))
+                )
+            conn.execute(_upsert(students, source=staging))
+            version = versioning.bump(conn)
+            # Баллы команд — по новым баллам участников
+            refresh_team_scores(conn)
+            # Снимок баллов для истории и прироста за неделю/месяц
+            snapshot_id = take_snapshot(conn, version)
+            # Достижения — по разнице с предыдущим снимком
+            evaluate_achievements(conn, snapshot_id)
+    finally:
+        with engine.begin() as conn:
+            staging.drop(conn, checkfirst=True)
+
+    versioning.notify(version)
+
+    stats["seconds"] = time.perf_counter() - started
+    stats["rows_per_second"] = stats["loaded"] / stats["seconds"] if stats["seconds"] else 0.0
+    stats["version"] = version
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Загрузка студентов из выгрузки вуза")
+    parser.add_argument("path", help="CSV, NDJSON (.ndjson/.jsonl) или JSON-массив (.json)")
+    parser.add_argument("--format", choices=["csv", "ndjson", "json"], help="формат файла (по расширению)")
+    parser.add_argument("--delimiter", default=",", help="разделитель CSV")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--keep-missing", action="store_true", help="не удалять студентов, которых нет в выгрузке")
+    parser.add_argument("--strict", action="store_true", help="прерывать загрузку на первой ошибке")
+    parser.add_argument("--max-missing", type=float, default=DEFAULT_MAX_MISSING,
+                        help="допустимая доля пропущенных строк и удаляемых студентов")
+    parser.add_argument("--force", action="store_true", help="загружать, даже если удаляется слишком много студентов")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or detect_format(args.path)
+    with open(args.path, encoding="utf-8-sig", newline="") as f:
+        try:
+            stats = ingest(
+                read_rows(f, fmt, args.delimiter),
+                batch_size=args.batch_size,
+                keep_missing=args.keep_missing,
+                strict=args.strict,
+                force=args.force,
+                max_missing=args.max_missing,
+            )
+        except SuspiciousLoad as e:
+            print(f"Загрузка прервана: {e}; students не изменена (--force — загрузить всё равно)", file=sys.stderr)
+            return 1
+        except (RowError, SchemaOutdated, ValueError) as e:
+            # ValueError — битый JSON/NDJSON в выгрузке
+            print(f"Загрузка прервана: {e}", file=sys.stderr)
+            return 1
+        except DBAPIError as e:
+            # Например, нарушение UNIQUE в живой таблице при переносе из теневой
+            print(f"Загрузка прервана: ошибка базы данных: {e.orig}", file=sys.stderr)
+            return 1
+
+    print(
+        f"Загружено {stats['loaded']} строк за {stats['seconds']:.1f} с "
+        f"({stats['rows_per_second']:.0f} строк/с), пропущено {stats['skipped']}, "
+        f"версия данных {stats['version']}"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
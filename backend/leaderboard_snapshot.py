@@ -0,0 +1,166 @@
+import asyncio
+import logging
+from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from config import settings
+import versioning
+
+try:
+    import numpy as np
+except ImportError:  # numpy необязателен — тогда лидерборд всегда строится запросом к БД
+    np = None
+
+# Колоночный снимок лидерборда (LEADERBOARD_ENGINE=snapshot).
+# На каждую версию данных строки студентов один раз читаются из БД в
+# неизменяемый снимок: баллы и курс — массивы numpy, школа и группа —
+# коды по отсортированному словарю значений. Для каждой сортировки порядок
+# считается заранее, поэтому фильтры и keyset-пагинация — это маски над
+# массивами без обращения к БД. Новый снимок подменяет старый одной
+# операцией присваивания, читатели работают с тем, что успели взять.
+
+logger = logging.getLogger(__name__)
+
+
+def _sort_key(values, descending: bool):
+    """Ключ, по возрастанию которого идёт порядок DESC NULLS LAST / ASC NULLS FIRST"""
+    if descending:
+        key = -values
+        key[np.isnan(key)] = np.inf
+    else:
+        key = values.copy()
+        key[np.isnan(key)] = -np.inf
+    return key
+
+
+def _position(sorted_values, value) -> float:
+    """Код значения в отсортированном словаре; отсутствующее попадает между соседями"""
+    i = int(np.searchsorted(sorted_values, value))
+    if i < len(sorted_values) and sorted_values[i] == value:
+        return float(i)
+    return i - 0.5
+
+
+class LeaderboardSnapshot:
+    """Неизменяемый снимок строк лидерборда одной версии данных"""
+
+    def __init__(self, version: int, rows: list, sort_fields: dict):
+        self.version = version
+        self.rows = rows
+        self._columns = {name: field.key for name, field in sort_fields.items()}
+
+        logins = np.array([row.login for row in rows], dtype=str)
+        login_order = np.argsort(logins, kind="stable")
+        self._sorted_logins = logins[login_order]
+        self._login_rank = np.empty(len(rows), dtype=np.int64)
+        self._login_rank[login_order] = np.arange(len(rows))
+
+        self._values = {}
+        self._dictionaries = {}
+        for name, field in sort_fields.items():
+            raw = [getattr(row, field.key) for row in rows]
+            if field.type.python_type is str:
+                dictionary = np.array(sorted({value for value in raw if value is not None}), dtype=str)
+                codes = {value: float(i) for i, value in enumerate(dictionary.tolist())}
+                self._dictionaries[name] = dictionary
+                self._values[name] = np.array([codes.get(value, np.nan) for value in raw], dtype=np.float64)
+            else:
+                self._values[name] = np.array([np.nan if value is None else value for value in raw], dtype=np.float64)
+
+        # Порядок строк и ключи для каждой сортировки; логин делает порядок однозначным
+        self._orders = {}
+        self._keys = {}
+        for name, values in self._values.items():
+            for descending in (True, False):
+                key = _sort_key(values, descending)
+                self._keys[name, descending] = key
+                self._orders[name, descending] = np.lexsort((self._login_rank, key))
+
+    def _equals(self, name: str, value):
+        dictionary = self._dictionaries[name]
+        code = _position(dictionary, value)
+        return self._values[name] == code
+
+    def _cursor_key(self, name: str, value, descending: bool) -> float:
+        if value is None:
+            return np.inf if descending else -np.inf
+        try:
+            if name in self._dictionaries:
+                key = _position(self._dictionaries[name], str(value))
+            else:
+                key = float(value)
+        except (TypeError, ValueError):
+            raise ValueError("cursor не соответствует сортировке")
+        return -key if descending else key
+
+    def page(self, school=None, group=None, min_score=None, max_score=None,
+             order_name: str = "score", descending: bool = True,
+             limit: Optional[int] = None, after: Optional[tuple] = None):
+        """
+        Строки страницы и (значение, логин) для курсора следующей страницы
+        (None, если страница последняя). Порядок тот же, что у запроса к БД.
+        """
+        mask = np.ones(len(self.rows), dtype=bool)
+        if school is not None:
+            mask &= self._equals("school", school)
+        if group is not None:
+            mask &= self._equals("group", group)
+        # Сравнение с NaN ложно — студенты без баллов отсекаются, как NULL в SQL
+        if min_score is not None:
+            mask &= self._values["score"] >= min_score
+        if max_score is not None:
+            mask &= self._values["score"] <= max_score
+
+        key = self._keys[order_name, descending]
+        if after is not None:
+            value, login = after
+            value_key = self._cursor_key(order_name, value, descending)
+            login_key = _position(self._sorted_logins, str(login))
+            mask &= (key > value_key) | ((key == value_key) & (self._login_rank > login_key))
+
+        order = self._orders[order_name, descending]
+        selected = order[mask[order]]
+
+        following = None
+        if limit is not None and len(selected) > limit:
+            selected = selected[:limit]
+            last = self.rows[selected[-1]]
+            following = (getattr(last, self._columns[order_name]), last.login)
+
+        return [self.rows[i] for i in selected.tolist()], following
+
+    def __len__(self):
+        return len(self.rows)
+
+
+class SnapshotStore:
+    """Текущий снимок лидерборда; перестраивается, когда меняется версия данных"""
+
+    def __init__(self):
+        self.enabled = settings.LEADERBOARD_ENGINE == "snapshot"
+        if self.enabled and np is None:
+            logger.warning("numpy не установлен, лидерборд строится запросами к БД")
+            self.enabled = False
+        self._snapshot: Optional[LeaderboardSnapshot] = None
+        self._rebuild_lock = asyncio.Lock()
+
+    async def get(self, db: AsyncSession, query, sort_fields: dict) -> LeaderboardSnapshot:
+        """Снимок текущей версии; query — запрос всех строк лидерборда без фильтров"""
+        version = await versioning.current(db)
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+
+        async with self._rebuild_lock:
+            # Пока ждали блокировку, снимок мог построить другой запрос
+            snapshot = self._snapshot
+            if snapshot is not None and snapshot.version == version:
+                return snapshot
+
+            rows = (await db.execute(query)).all()
+            # Сборка массивов занимает процессор — не задерживаем остальные запросы
+            snapshot = await asyncio.to_thread(LeaderboardSnapshot, version, rows, sort_fields)
+            self._snapshot = snapshot
+            return snapshot
+
+
+leaderboard_snapshot = SnapshotStore()
@@ -1,12 +1,28 @@
 # main.py (ИСПРАВЛЕННЫЙ для отдачи статических файлов фронтенда и API)
 from fastapi import FastAPI, Depends, Request, HTTPException
-from fastapi.responses import RedirectResponse, FileResponse
-from routes import leaderboard, auth, profile
-from database import engine, Base
+from fastapi.responses import RedirectResponse
+from routes import leaderboard, auth, profile, teams, monitoring
+from database import engine
+from contextlib import asynccontextmanager
+from migrations import require_current
+from search_index import ensure_search_index
+from team_scores import ensure_team_scores
+from rank_stream import rank_stream
+from token_refresh import token_refresher
+from tpu_oauth import TPUOAuthService
+from static_assets import AssetManifest
+from metrics import MetricsMiddleware, instrument_engine
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
+from session_store import ServerSessionMiddleware
+from user_cache import user_cache
 from config import settings
+from database import get_db
 from dependencies import login_required
+from models import User
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 import uuid
 import os
@@ -14,12 +30,41 @@ import os
 # --- НАСТРОЙКА ПУТИ К СБОРКЕ ФРОНТЕНДА ---
 # Убедитесь, что путь соответствует местоположению папки dist после сборки npm run build
 STATIC_DIR = os.path.join(os.path.dirname(__file__), "static")
+STATIC_EXTENSIONS = frozenset([".js", ".css", ".svg", ".png", ".jpg", ".jpeg", ".gif", ".ico", ".woff", ".woff2", ".ttf", ".otf", ".json", ".map"])
+static_manifest = AssetManifest(STATIC_DIR)
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    static_manifest.build()
+
+    # --- ПРОВЕРКА СХЕМЫ БАЗЫ ДАННЫХ ---
+    # Схему создают и обновляют миграции (make migrate) до старта воркеров;
+    # с устаревшей схемой приложение не запускается
+    async with engine.begin() as conn:
+        await conn.run_sync(require_current)
+        await conn.run_sync(ensure_search_index)
+        await conn.run_sync(ensure_team_scores)
+
+    # Фоновый опрос версии данных для потока изменений рейтинга
+    rank_stream.start()
+    # Обновление истекающих OAuth-токенов пользователей
+    if settings.TOKEN_REFRESH_ENABLED:
+        token_refresher.start()
+    yield
+    await token_refresher.stop()
+    await rank_stream.stop()
+    await TPUOAuthService.close()
+    await engine.dispose()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # --- НАСТРОЙКА MIDDLEWARE ---
-app.add_middleware(SessionMiddleware, secret_key=settings.SECRET_KEY)
+if settings.SESSION_STORE == "server":
+    app.add_middleware(ServerSessionMiddleware, secret_key=settings.SECRET_KEY, max_age=settings.SESSION_MAX_AGE)
+else:
+    app.add_middleware(SessionMiddleware, secret_key=settings.SECRET_KEY, max_age=settings.SESSION_MAX_AGE)
 
 # --- CORS (для одного сервера) ---
 # Разрешаем запросы с нашего же домена и порта
@@ -29,15 +74,19 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
-# --- СОЗДАНИЕ ТАБЛИЦ БАЗЫ ДАННЫХ ---
-Base.metadata.create_all(bind=engine)
+# --- МЕТРИКИ (внешний слой: время включает остальные middleware) ---
+app.add_middleware(MetricsMiddleware)
+instrument_engine(engine.sync_engine)
 
 # --- ПОДКЛЮЧЕНИЕ РОУТЕРОВ (обязательно до общего маршрута для index.html) ---
 app.include_router(leaderboard.router)
 app.include_router(auth.router)
 app.include_router(profile.router)
+app.include_router(teams.router)
+app.include_router(monitoring.router)
 
 # --- МОДЕЛЬ ДЛЯ ТЕСТОВОЙ АВТОРИЗАЦИИ ---
 class TestUserData(BaseModel):
@@ -46,8 +95,33 @@ class TestUserData(BaseModel):
     email: str
     tpu_user_id: str
 
+async def sign_in_test_user(request: Request, db: AsyncSession, test_user: dict) -> dict:
+    """
+    Вход тестового пользователя: как и callback OAuth, заводит строку в users,
+    без неё /auth/me и /api/user/rank (get_current_user) ответят 401.
+    """
+    result = await db.execute(select(User).where(User.tpu_user_id == test_user["tpu_user_id"]))
+    user = result.scalars().first()
+    if not user:
+        user = User(id=test_user["id"], tpu_user_id=test_user["tpu_user_id"])
+        db.add(user)
+    user.email = test_user["email"]
+    user.first_name = test_user["first_name"]
+    user.last_name = test_user["last_name"]
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Email уже занят другим пользователем")
+    user_cache.invalidate(user.id)
+
+    test_user = {**test_user, "id": user.id}
+    request.session["user_id"] = user.id
+    request.session["user_info"] = test_user
+    return test_user
+
 @app.post("/auth/test-login")
-async def test_login(request: Request, user_data: TestUserData):
+async def test_login(request: Request, user_data: TestUserData, db: AsyncSession = Depends(get_db)):
     """Тестовый логин с кастомными данными"""
     test_user = {
         "id": f"test-user-{user_data.tpu_user_id}",
@@ -57,19 +131,17 @@ async def test_login(request: Request, user_data: TestUserData):
         "last_name": user_data.last_name
     }
 
-    request.session["user_id"] = test_user["id"]
-    request.session["user_info"] = test_user
-
-    return test_user
+    return await sign_in_test_user(request, db, test_user)
 
 @app.post("/auth/logout")
 async def logout_post(request: Request):
     """Выход пользователя (POST версия)"""
+    user_cache.invalidate(request.session.get("user_id"))
     request.session.clear()
     return {"message": "Logged out"}
 
 @app.get("/auth/simple-login")
-async def simple_login(request: Request):
+async def simple_login(request: Request, db: AsyncSession = Depends(get_db)):
     """Простой тестовый логин без ТПУ"""
     test_user = {
         "id": "test-user-123",
@@ -79,8 +151,7 @@ async def simple_login(request: Request):
         "last_name": "Иванов"
     }
 
-    request.session["user_id"] = test_user["id"]
-    request.session["user_info"] = test_user
+    await sign_in_test_user(request, db, test_user)
 
     # Перенаправляем на корень
     return RedirectResponse("/")
@@ -88,8 +159,6 @@ async def simple_login(request: Request):
 @app.get("/auth/debug-login")
 async def debug_login(request: Request):
     """Тестовый логин с реальным редиректом на ТПУ"""
-    from tpu_oauth import TPUOAuthService
-
     if not settings.TPU_CLIENT_ID or settings.TPU_CLIENT_ID == "your_client_id":
         return {
             "error": "Настройте ключи ТПУ",
@@ -119,57 +188,38 @@ async def check_config():
 
 # --- ОСНОВНОЙ МАРШРУТ ДЛЯ ОТДАЧИ index.html (должен быть ПОСЛЕ всех других маршрутов) ---
 @app.get("/{full_path:path}")
-async def serve_spa(full_path: str):
+async def serve_spa(full_path: str, request: Request):
     """
     Обслуживание Single Page Application (React).
     Все маршруты, не начинающиеся с /api/ или /auth/, и не являющиеся статическими файлами, будут отдавать index.html.
     Это позволяет React Router работать правильно.
     """
-    # Логирование для отладки
-    print(f"Запрос на: {full_path}")
-
     # Исключаем API маршруты
     if full_path.startswith("api/") or full_path.startswith("auth/"):
         raise HTTPException(status_code=404, detail="Not Found - API Route")
 
-    # Проверяем, является ли запрос статическим файлом
-    static_extensions = [".js", ".css", ".svg", ".png", ".jpg", ".jpeg", ".gif", ".ico", ".woff", ".woff2", ".ttf", ".otf", ".json", ".map"]
-    if any(full_path.endswith(ext) for ext in static_extensions):
-        file_path = os.path.join(STATIC_DIR, full_path)
-        print(f"Ищу файл: {file_path}")
-        if os.path.exists(file_path):
-            print(f"Нашёл файл: {file_path}")
-            return FileResponse(file_path)
-        else:
-            # Если файл не найден в указанном пути, попробуем найти его в корне dist
-            # Например, если запрос был /assets/file.otf, но файла нет в assets/, попробуем /file.otf
-            filename = os.path.basename(full_path)
-            file_path_in_root = os.path.join(STATIC_DIR, filename)
-            print(f"Ищу файл в корне: {file_path_in_root}")
-            if os.path.exists(file_path_in_root):
-                print(f"Нашёл файл в корне: {file_path_in_root}")
-                return FileResponse(file_path_in_root)
-            else:
-                print(f"Файл не найден: {file_path}")
-                raise HTTPException(status_code=404, detail=f"Файл не найден: {full_path}")
+    # Статические файлы отдаются из манифеста, собранного при старте
+    asset = static_manifest.find(full_path)
+    if asset is not None:
+        return asset.response(request)
+
+    if os.path.splitext(full_path)[1] in STATIC_EXTENSIONS:
+        raise HTTPException(status_code=404, detail=f"Файл не найден: {full_path}")
 
     # Для всех остальных запросов отдаём index.html
-    index_path = os.path.join(STATIC_DIR, "index.html")
-    if os.path.exists(index_path):
-        return FileResponse(index_path)
-    else:
-        raise HTTPException(status_code=404, detail="Страница не найдена")
+    return index_response(request)
 
 @app.get("/")
-async def read_root():
+async def read_root(request: Request):
     """
     Корневой маршрут для отдачи index.html.
     """
-    index_path = os.path.join(STATIC_DIR, "index.html")
-    if os.path.exists(index_path):
-        return FileResponse(index_path)
-    else:
+    return index_response(request)
+
+def index_response(request: Request):
+    if static_manifest.index is None:
         raise HTTPException(status_code=404, detail="Страница не найдена")
+    return static_manifest.index.response(request)
     
 @app.get("/protected")
 async def protected_route(auth_required: bool = Depends(login_required)):
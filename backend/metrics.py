@@ -0,0 +1,263 @@
+import logging
+import re
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Optional
+from sqlalchemy import event
+from response_cache import response_cache
+from single_flight import single_flight
+from token_refresh import token_refresher
+from user_cache import user_cache
+
+# Метрики запросов в формате Prometheus.
+# Middleware замеряет время обработки и статус ответа по шаблону маршрута
+# (/api/profile/{login}, а не конкретный адрес), события движка SQLAlchemy
+# считают запросы к БД текущего HTTP-запроса. Всё хранится в простых словарях
+# одного процесса: приложение асинхронное, блокировки не нужны.
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# Один и тот же SQL больше стольких раз за запрос — признак N+1
+N_PLUS_ONE_THRESHOLD = 10
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+_NUMBERS_RE = re.compile(r"\b\d+\b")
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class RequestStats:
+    """Запросы к БД в рамках одного HTTP-запроса"""
+    __slots__ = ("queries", "query_time", "statements")
+
+    def __init__(self):
+        self.queries = 0
+        self.query_time = 0.0
+        self.statements = {}
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+# (method, route, status) -> число ответов
+requests_total = {}
+# (method, route) -> Histogram
+request_duration = {}
+# route -> Histogram числа запросов к БД на HTTP-запрос
+queries_per_request = {}
+# route -> [число запросов к БД, суммарное время]
+query_totals = {}
+# route -> число HTTP-запросов с N+1
+n_plus_one_total = {}
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Начало храним в контексте выполнения, а не в соединении: если запрос
+    # упал, after_cursor_execute не вызывается и в соединении остался бы мусор
+    if context is not None:
+        context._query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_query_start", None)
+    stats = _current.get()
+    if stats is None or started is None:
+        return
+    stats.queries += 1
+    stats.query_time += time.perf_counter() - started
+    stats.statements[statement] = stats.statements.get(statement, 0) + 1
+
+
+def instrument_engine(sync_engine):
+    """Подключает подсчёт запросов к движку (для AsyncEngine — к engine.sync_engine)"""
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _route_path(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or UNMATCHED_ROUTE
+
+
+def _record(method: str, route: str, status: int, elapsed: float, stats: RequestStats):
+    key = (method, route, status)
+    requests_total[key] = requests_total.get(key, 0) + 1
+
+    histogram = request_duration.get((method, route))
+    if histogram is None:
+        histogram = request_duration[(method, route)] = Histogram(LATENCY_BUCKETS)
+    histogram.observe(elapsed)
+
+    histogram = queries_per_request.get(route)
+    if histogram is None:
+        histogram = queries_per_request[route] = Histogram(QUERY_COUNT_BUCKETS)
+    histogram.observe(stats.queries)
+
+    totals = query_totals.setdefault(route, [0, 0.0])
+    totals[0] += stats.queries
+    totals[1] += stats.query_time
+
+    if stats.statements:
+        statement, repeats = max(stats.statements.items(), key=lambda item: item[1])
+        if repeats > N_PLUS_ONE_THRESHOLD:
+            n_plus_one_total[route] = n_plus_one_total.get(route, 0) + 1
+            logger.warning(
+                "N+1 в %s %s: запрос выполнен %d раз: %s",
+                method, route, repeats, _NUMBERS_RE.sub("?", " ".join(statement.split()))[:200]
+            )
+
+
+class MetricsMiddleware:
+    """ASGI middleware: время обработки, статус и число запросов к БД по маршрутам"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            _current.reset(token)
+            _record(scope["method"], _route_path(scope), status, elapsed, stats)
+
+
+# --- ЭКСПОРТ ---
+
+def _labels(**labels) -> str:
+    parts = []
+    for name, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{name}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _histogram_lines(name: str, histogram: Histogram, **labels):
+    cumulative = 0
+    for bound, count in zip(histogram.buckets, histogram.counts):
+        cumulative += count
+        yield f"{name}_bucket{_labels(**labels, le=bound)} {cumulative}"
+    yield f"{name}_bucket{_labels(**labels, le='+Inf')} {histogram.count}"
+    yield f"{name}_sum{_labels(**labels)} {histogram.sum}"
+    yield f"{name}_count{_labels(**labels)} {histogram.count}"
+
+
+def render() -> str:
+    """Все метрики в текстовом формате Prometheus"""
+    lines = [
+        "# HELP http_requests_total HTTP responses by route and status",
+        "# TYPE http_requests_total counter",
+    ]
+    for (method, route, status), count in sorted(requests_total.items()):
+        lines.append(f"http_requests_total{_labels(method=method, route=route, status=status)} {count}")
+
+    lines += [
+        "# HELP http_request_duration_seconds Request handling time",
+        "# TYPE http_request_duration_seconds histogram",
+    ]
+    for (method, route), histogram in sorted(request_duration.items()):
+        lines.extend(_histogram_lines("http_request_duration_seconds", histogram, method=method, route=route))
+
+    lines += [
+        "# HELP db_queries_per_request SQL statements issued per HTTP request",
+        "# TYPE db_queries_per_request histogram",
+    ]
+    for route, histogram in sorted(queries_per_request.items()):
+        lines.extend(_histogram_lines("db_queries_per_request", histogram, route=route))
+
+    lines += [
+        "# HELP db_queries_total SQL statements issued by route",
+        "# TYPE db_queries_total counter",
+    ]
+    for route, (count, _) in sorted(query_totals.items()):
+        lines.append(f"db_queries_total{_labels(route=route)} {count}")
+
+    lines += [
+        "# HELP db_query_seconds_total Time spent in SQL statements by route",
+        "# TYPE db_query_seconds_total counter",
+    ]
+    for route, (_, seconds) in sorted(query_totals.items()):
+        lines.append(f"db_query_seconds_total{_labels(route=route)} {seconds}")
+
+    lines += [
+        "# HELP db_n_plus_one_total Requests that repeated one SQL statement more than "
+        f"{N_PLUS_ONE_THRESHOLD} times",
+        "# TYPE db_n_plus_one_total counter",
+    ]
+    for route, count in sorted(n_plus_one_total.items()):
+        lines.append(f"db_n_plus_one_total{_labels(route=route)} {count}")
+
+    lines += [
+        "# HELP response_cache_hits_total Response cache hits",
+        "# TYPE response_cache_hits_total counter",
+        f"response_cache_hits_total {response_cache.hits}",
+        "# HELP response_cache_misses_total Response cache misses",
+        "# TYPE response_cache_misses_total counter",
+        f"response_cache_misses_total {response_cache.misses}",
+        "# HELP response_cache_entries Responses currently cached",
+        "# TYPE response_cache_entries gauge",
+        f"response_cache_entries {len(response_cache)}",
+        "# HELP user_cache_hits_total Current user cache hits",
+        "# TYPE user_cache_hits_total counter",
+        f"user_cache_hits_total {user_cache.hits}",
+        "# HELP user_cache_misses_total Current user cache misses",
+        "# TYPE user_cache_misses_total counter",
+        f"user_cache_misses_total {user_cache.misses}",
+        "# HELP single_flight_executed_total Computations started for a request key",
+        "# TYPE single_flight_executed_total counter",
+    ]
+    for name, count in sorted(single_flight.executed.items()):
+        lines.append(f"single_flight_executed_total{_labels(name=name)} {count}")
+
+    lines += [
+        "# HELP single_flight_coalesced_total Requests that waited for an identical in-flight computation",
+        "# TYPE single_flight_coalesced_total counter",
+    ]
+    for name, count in sorted(single_flight.coalesced.items()):
+        lines.append(f"single_flight_coalesced_total{_labels(name=name)} {count}")
+
+    lines += [
+        "# HELP token_refresh_total Background OAuth token refreshes by outcome",
+        "# TYPE token_refresh_total counter",
+    ]
+    for outcome, count in sorted(token_refresher.results.items()):
+        lines.append(f"token_refresh_total{_labels(outcome=outcome)} {count}")
+    if token_refresher.last_run is not None:
+        lines += [
+            "# HELP token_refresh_last_run_timestamp_seconds End of the last token refresh pass",
+            "# TYPE token_refresh_last_run_timestamp_seconds gauge",
+            f"token_refresh_last_run_timestamp_seconds {token_refresher.last_run}",
+        ]
+    return "\n".join(lines) + "\n"
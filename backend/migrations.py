@@ -0,0 +1,254 @@
+"""
+Миграции схемы БД.
+
+    python backend/migrations.py            # применить недостающие миграции
+    python backend/migrations.py status     # список применённых и ожидающих
+    python backend/migrations.py check      # планы запросов лидерборда (SQLite)
+    python backend/migrations.py vacuum     # VACUUM и перестройка поискового индекса (SQLite)
+
+Миграции запускаются явно (make migrate) до старта приложения и загрузки
+данных: воркеры uvicorn и ingest.py только проверяют, что схема актуальна.
+Применённые версии записываются в schema_migrations; каждая миграция
+выполняется в своей транзакции. Новую миграцию добавляют в конец
+MIGRATIONS со следующим номером, уже применённые не меняют.
+"""
+import argparse
+import sys
+from datetime import datetime
+from sqlalchemy import select, text
+from database import sync_engine as engine, Base
+from models import (
+    SchemaMigration, Student, User, StudentEmail, DataVersion, ScoreSnapshot, ScoreHistory,
+    ScoreGain, ServerSession, Project, Team, Membership, TeamScore, Achievement,
+)
+from search_index import ensure_search_index, rebuild_search_index, refold_search_index
+
+
+class SchemaOutdated(RuntimeError):
+    pass
+
+
+# --- МИГРАЦИИ ---
+
+# Таблицы, существовавшие до появления миграций. Список заморожен: новые
+# таблицы и индексы создаются только своей миграцией, иначе свежая и
+# обновлённая БД получили бы разную схему.
+INITIAL_TABLES = [
+    Student, User, StudentEmail, DataVersion, ScoreSnapshot, ScoreHistory, ScoreGain,
+    ServerSession, Project, Team, Membership, TeamScore,
+]
+
+
+def _initial_schema(conn):
+    # Таблицы, созданные раньше через create_all, остаются как есть
+    Base.metadata.create_all(bind=conn, tables=[model.__table__ for model in INITIAL_TABLES])
+
+
+def _search_index(conn):
+    ensure_search_index(conn)
+
+
+# Индексы под запросы лидерборда (routes/leaderboard.py): фильтр по школе
+# или группе с сортировкой по баллам, диапазон баллов и сортировка по
+# каждому столбцу. Логин в конце делает порядок индекса равным порядку
+# keyset-пагинации, поэтому страница читается из индекса без сортировки.
+LEADERBOARD_INDEXES = {
+    "ix_students_score": ("study_score DESC", "login"),
+    "ix_students_school_score": ("direction_name", "study_score DESC", "login"),
+    "ix_students_group_score": ("student_group", "study_score DESC", "login"),
+    "ix_students_school": ("direction_name", "login"),
+    "ix_students_group": ("student_group", "login"),
+    "ix_students_year": ("study_year", "login"),
+}
+
+
+def _leaderboard_indexes(conn):
+    for name, columns in LEADERBOARD_INDEXES.items():
+        if conn.dialect.name == "postgresql":
+            # В PostgreSQL DESC по умолчанию ставит NULL первыми, а лидерборд — последними
+            columns = [column + " NULLS LAST" if column.endswith(" DESC") else column for column in columns]
+        conn.execute(text(
+            f"CREATE INDEX IF NOT EXISTS {name} ON {Student.__tablename__} ({', '.join(columns)})"
+        ))
+    if conn.dialect.name == "sqlite":
+        # Статистика для выбора индекса планировщиком
+        conn.execute(text("ANALYZE"))
+
+
+def _achievements(conn):
+    Achievement.__table__.create(bind=conn, checkfirst=True)
+
+
+def _token_expires_index(conn):
+    # Выборка истекающих токенов для фонового обновления (token_refresh.py)
+    conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_users_token_expires ON {User.__tablename__} (token_expires)"))
+
+
+def _search_index_yo(conn):
+    # Поисковый индекс и запрос не различают ё и е
+    refold_search_index(conn)
+
+
+MIGRATIONS = [
+    (1, "initial schema", _initial_schema),
+    (2, "search index", _search_index),
+    (3, "leaderboard indexes", _leaderboard_indexes),
+    (4, "achievements", _achievements),
+    (5, "token expiry index", _token_expires_index),
+    (6, "search index without yo", _search_index_yo),
+]
+
+
+# --- ПРИМЕНЕНИЕ ---
+
+def applied_versions(conn) -> set:
+    SchemaMigration.__table__.create(bind=conn, checkfirst=True)
+    return set(conn.execute(select(SchemaMigration.version)).scalars())
+
+
+def pending(conn) -> list:
+    applied = applied_versions(conn)
+    return [(version, name) for version, name, _ in MIGRATIONS if version not in applied]
+
+
+def upgrade(log=print) -> int:
+    """Применяет недостающие миграции по порядку, возвращает их число"""
+    with engine.begin() as conn:
+        applied = applied_versions(conn)
+
+    count = 0
+    for version, name, migrate in MIGRATIONS:
+        if version in applied:
+            continue
+        log(f"  {version:03d} {name}")
+        with engine.begin() as conn:
+            # Миграцию мог применить параллельный запуск
+            if conn.execute(select(SchemaMigration.version).where(SchemaMigration.version == version)).first():
+                continue
+            migrate(conn)
+            conn.execute(SchemaMigration.__table__.insert().values(
+                version=version, name=name, applied_at=datetime.utcnow()
+            ))
+        count += 1
+    return count
+
+
+def require_current(conn):
+    """Проверка перед работой с БД: все миграции применены (синхронное соединение)"""
+    missing = pending(conn)
+    if missing:
+        names = ", ".join(f"{version:03d} {name}" for version, name in missing)
+        raise SchemaOutdated(
+            f"Схема БД не обновлена (не применены: {names}), выполните make migrate"
+        )
+
+
+# --- ПРОВЕРКА ПЛАНОВ ЗАПРОСОВ ---
+
+# Фильтры и сортировки лидерборда, которые должны обслуживаться индексами
+PLAN_CASES = [
+    ({}, "score", True),
+    ({}, "score", False),
+    ({}, "school", False),
+    ({}, "group", False),
+    ({}, "year", False),
+    ({"school": "Инженерная школа ядерных технологий"}, "score", True),
+    ({"group": "8К21"}, "score", True),
+    ({"min_score": 50.0, "max_score": 90.0}, "score", True),
+]
+
+
+def explain(conn, query) -> list:
+    compiled = query.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True})
+    return [row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {compiled}"))]
+
+
+def plan_problems(plan: list) -> list:
+    """Полный просмотр таблицы без индекса или полная сортировка результата"""
+    problems = []
+    for detail in plan:
+        if detail.startswith("SCAN") and " INDEX " not in detail:
+            problems.append(detail)
+        elif detail == "USE TEMP B-TREE FOR ORDER BY":
+            # Досортировка по логину («LAST TERM», «RIGHT PART») допустима
+            problems.append(detail)
+    return problems
+
+
+def check(log=print) -> bool:
+    """Проверяет планы запросов лидерборда, возвращает True, если все используют индексы"""
+    from routes.leaderboard import leaderboard_query
+
+    with engine.connect() as conn:
+        if conn.dialect.name != "sqlite":
+            log("Проверка планов поддерживается только для SQLite")
+            return True
+        require_current(conn)
+
+        ok = True
+        for filters, order_name, descending in PLAN_CASES:
+            query, _, _ = leaderboard_query(
+                None, filters.get("school"), filters.get("group"),
+                filters.get("min_score"), filters.get("max_score"), order_name, descending
+            )
+            plan = explain(conn, query.limit(50))
+            problems = plan_problems(plan)
+            label = f"{order_name} {'desc' if descending else 'asc'} {filters or ''}".strip()
+            log(f"{'FAIL' if problems else 'ok  '} {label}: {'; '.join(plan)}")
+            ok = ok and not problems
+        return ok
+
+
+# --- ОБСЛУЖИВАНИЕ ---
+
+def vacuum(log=print):
+    """Сжимает файл SQLite и перестраивает FTS-индекс: VACUUM меняет rowid студентов"""
+    with engine.connect() as conn:
+        if conn.dialect.name != "sqlite":
+            log("VACUUM поддерживается только для SQLite")
+            return
+        require_current(conn)
+
+    # VACUUM не выполняется внутри транзакции
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("VACUUM"))
+    with engine.begin() as conn:
+        if ensure_search_index(conn):
+            rebuild_search_index(conn)
+    log("VACUUM выполнен, поисковый индекс перестроен")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Миграции схемы БД")
+    parser.add_argument("command", nargs="?", default="upgrade", choices=["upgrade", "status", "check", "vacuum"])
+    args = parser.parse_args(argv)
+
+    if args.command == "status":
+        with engine.begin() as conn:
+            applied = applied_versions(conn)
+        for version, name, _ in MIGRATIONS:
+            print(f"{'+' if version in applied else ' '} {version:03d} {name}")
+        return 0
+
+    if args.command == "check":
+        try:
+            return 0 if check() else 1
+        except SchemaOutdated as e:
+            print(e, file=sys.stderr)
+            return 1
+
+    if args.command == "vacuum":
+        try:
+            vacuum()
+        except SchemaOutdated as e:
+            print(e, file=sys.stderr)
+            return 1
+        return 0
+
+    count = upgrade()
+    print(f"Применено миграций: {count}" if count else "Схема БД актуальна")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, Text, ForeignKey, Index
 from database import Base
 from datetime import datetime
 import uuid
@@ -28,7 +28,7 @@ class User(Base):
     last_name = Column(String(100))
     access_token = Column(String(500))
     refresh_token = Column(String(500))
-    token_expires = Column(DateTime)
+    token_expires = Column(DateTime)  # индекс ix_users_token_expires — миграция 005
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -40,3 +40,130 @@ class User(Base):
             "first_name":  self.first_name,
             "last_name":   self.last_name
         }
+
+
+class SchemaMigration(Base):
+    __tablename__ = "schema_migrations"
+
+    # Применённые миграции схемы (см. migrations.py)
+    version = Column(Integer, primary_key=True, autoincrement=False)
+    name = Column(String(100), nullable=False)
+    applied_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class DataVersion(Base):
+    __tablename__ = "data_versions"
+
+    name = Column(String(50), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
+class StudentEmail(Base):
+    __tablename__ = "student_emails"
+
+    # Соответствие email пользователя студенту; student_login = NULL означает,
+    # что студент не найден в версии данных data_version
+    email = Column(String(120), primary_key=True)
+    student_login = Column(String(50), index=True)
+    data_version = Column(Integer)
+
+
+class ScoreSnapshot(Base):
+    __tablename__ = "score_snapshots"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    taken_at = Column(DateTime, nullable=False, index=True)
+    data_version = Column(Integer)
+
+
+class ScoreHistory(Base):
+    __tablename__ = "score_history"
+
+    snapshot_id = Column(Integer, ForeignKey("score_snapshots.id", ondelete="CASCADE"), primary_key=True)
+    login = Column(String(50), primary_key=True)
+    study_score = Column(Float)
+    position = Column(Integer)
+
+
+class ScoreGain(Base):
+    __tablename__ = "score_gains"
+
+    # Прирост баллов и мест за период, пересчитывается при каждом снимке
+    period = Column(String(10), primary_key=True)
+    login = Column(String(50), primary_key=True)
+    points_gained = Column(Float, nullable=False)
+    positions_gained = Column(Integer, nullable=False)
+    snapshot_id = Column(Integer)
+
+    __table_args__ = (
+        Index("ix_score_gains_period_points", "period", points_gained.desc(), "login"),
+    )
+
+
+class Achievement(Base):
+    __tablename__ = "achievements"
+
+    # Достижения студентов, находятся при снимке баллов (см. achievements.py)
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    login = Column(String(50), nullable=False)
+    kind = Column(String(20), nullable=False)  # 'position', 'badge', 'streak'
+    value = Column(Float)
+    text = Column(String(300), nullable=False)
+    snapshot_id = Column(Integer, index=True)
+    created_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("ix_achievements_login_id", "login", id.desc()),
+    )
+
+
+class ServerSession(Base):
+    __tablename__ = "server_sessions"
+
+    # Данные сессии при SESSION_STORE=server (см. session_store.py)
+    id = Column(String(64), primary_key=True)
+    data = Column(Text, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+
+class Project(Base):
+    __tablename__ = "projects"
+
+    id_project = Column(Integer, primary_key=True, autoincrement=True)
+    project_name = Column(String(200), nullable=False, index=True)
+    description = Column(Text)
+    info_akadem = Column(Text)
+
+
+class Team(Base):
+    __tablename__ = "teams"
+
+    team_id = Column(Integer, primary_key=True, autoincrement=True)
+    project_id = Column(Integer, ForeignKey("projects.id_project", ondelete="CASCADE"), nullable=False, index=True)
+    expert_score = Column(String(10))
+    period_start = Column(Date, index=True)
+    period_end = Column(Date)
+
+
+class Membership(Base):
+    __tablename__ = "student_teams"
+
+    team_id = Column(Integer, ForeignKey("teams.team_id", ondelete="CASCADE"), primary_key=True)
+    student_login = Column(String(50), ForeignKey("students.login", ondelete="CASCADE"), primary_key=True, index=True)
+    rol = Column(String(20), nullable=False)  # 'Студент' или 'Наставник'
+    joined_date = Column(DateTime, default=datetime.utcnow)
+
+
+class TeamScore(Base):
+    __tablename__ = "team_scores"
+
+    # Агрегат баллов участников команды (без наставников), см. team_scores.py
+    team_id = Column(Integer, ForeignKey("teams.team_id", ondelete="CASCADE"), primary_key=True)
+    member_count = Column(Integer, nullable=False, default=0)
+    score_sum = Column(Float, nullable=False, default=0.0)
+    score_avg = Column(Float)
+
+    __table_args__ = (
+        Index("ix_team_scores_avg", score_avg.desc(), "team_id"),
+        Index("ix_team_scores_sum", score_sum.desc(), "team_id"),
+    )
@@ -0,0 +1,106 @@
+"""
+Локальная заглушка OAuth-сервера ТПУ для отладки и нагрузочного тестирования.
+
+    uvicorn oauth_stub:app --port 9000 --app-dir backend
+
+и в .env:
+
+    TPU_AUTH_URL=http://localhost:9000/authorize
+    TPU_TOKEN_URL=http://localhost:9000/access_token
+    TPU_USER_INFO_URL=http://localhost:9000/v2/auth/user
+    TPU_LOGOUT_URL=http://localhost:9000/auth/logout
+
+/authorize сразу перенаправляет обратно с кодом. Пользователь выбирается
+параметром login_hint (логин студента), иначе случайно. STUB_LATENCY_MS
+добавляет задержку к каждому ответу, STUB_FAILURE_RATE — долю ответов 503.
+"""
+import asyncio
+import os
+import random
+import secrets
+from urllib.parse import urlencode
+from fastapi import FastAPI, Form, HTTPException, Query
+from fastapi.responses import RedirectResponse, JSONResponse
+
+LATENCY = float(os.getenv("STUB_LATENCY_MS", "0")) / 1000
+FAILURE_RATE = float(os.getenv("STUB_FAILURE_RATE", "0"))
+TOKEN_TTL = int(os.getenv("STUB_TOKEN_TTL", "3600"))
+
+app = FastAPI(title="TPU OAuth stub")
+
+# code / access_token / refresh_token -> логин пользователя
+_codes = {}
+_access_tokens = {}
+_refresh_tokens = {}
+
+
+async def _simulate():
+    if LATENCY:
+        await asyncio.sleep(LATENCY)
+    if FAILURE_RATE and random.random() < FAILURE_RATE:
+        raise HTTPException(status_code=503, detail="stub failure")
+
+
+def _user_id(login: str) -> int:
+    return int.from_bytes(login.encode(), "little") % 10_000_000
+
+
+def _issue_tokens(login: str) -> dict:
+    access_token = secrets.token_urlsafe(24)
+    refresh_token = secrets.token_urlsafe(24)
+    _access_tokens[access_token] = login
+    _refresh_tokens[refresh_token] = login
+    return {
+        "access_token": access_token,
+        "refresh_token": refresh_token,
+        "token_type": "Bearer",
+        "expires_in": TOKEN_TTL,
+    }
+
+
+@app.get("/authorize")
+async def authorize(redirect_uri: str, state: str = "", login_hint: str = None):
+    login = login_hint or f"user{random.randint(1, 100000)}"
+    code = secrets.token_urlsafe(16)
+    _codes[code] = login
+    return RedirectResponse(f"{redirect_uri}?{urlencode({'code': code, 'state': state})}")
+
+
+@app.post("/access_token")
+async def access_token(
+    grant_type: str = Form(...),
+    code: str = Form(None),
+    refresh_token: str = Form(None),
+):
+    await _simulate()
+
+    if grant_type == "authorization_code":
+        login = _codes.pop(code, None)
+    elif grant_type == "refresh_token":
+        login = _refresh_tokens.pop(refresh_token, None)
+    else:
+        login = None
+
+    if login is None:
+        return JSONResponse({"error": "invalid_grant"}, status_code=400)
+    return _issue_tokens(login)
+
+
+@app.get("/v2/auth/user")
+async def user_info(access_token: str = Query(...)):
+    await _simulate()
+
+    login = _access_tokens.get(access_token)
+    if login is None:
+        return JSONResponse({"error": "invalid_token"}, status_code=401)
+
+    return {
+        "user_id": _user_id(login),
+        "email": f"{login}@tpu.ru",
+        "lichnost": {"imya": "Тест", "familiya": login},
+    }
+
+
+@app.get("/auth/logout")
+async def logout(redirect: str = "/"):
+    return RedirectResponse(redirect)
@@ -0,0 +1,139 @@
+import asyncio
+import math
+import threading
+from bisect import bisect_left, insort
+from typing import Optional, Tuple
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import Student
+import versioning
+
+
+class RankIndex:
+    """
+    Индекс мест в общем рейтинге.
+    Ключи (-балл, логин) хранятся в отсортированном массиве, поэтому место
+    студента и студент на заданном месте находятся бинарным поиском за O(log n).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rebuild_lock = asyncio.Lock()
+        self._keys = []
+        self._by_login = {}
+        self._version = None
+
+    @staticmethod
+    def _key(login: str, score) -> tuple:
+        # Студенты без баллов идут в конце, как NULL при ORDER BY study_score DESC
+        return (-float(score) if score is not None else math.inf, login)
+
+    async def ensure(self, db: AsyncSession):
+        """Перестраивает индекс, если версия данных изменилась"""
+        version = await versioning.current(db)
+        if version == self._version:
+            return
+
+        async with self._rebuild_lock:
+            # Пока ждали блокировку, индекс мог перестроить другой запрос
+            if version == self._version:
+                return
+
+            rows = (await db.execute(select(Student.login, Student.study_score))).all()
+            by_login = {login: self._key(login, score) for login, score in rows}
+            keys = sorted(by_login.values())
+
+            with self._lock:
+                self._by_login = by_login
+                self._keys = keys
+                self._version = version
+
+    def apply(self, version: int, changes):
+        """Точечно обновляет индекс после изменения студентов через ORM"""
+        with self._lock:
+            if changes is None or self._version != version - 1:
+                # Пропущены чужие изменения — индекс перестроится при следующем чтении
+                self._version = None
+                return
+
+            for login, score in changes.items():
+                old_key = self._by_login.pop(login, None)
+                if old_key is not None:
+                    del self._keys[bisect_left(self._keys, old_key)]
+                if score is not versioning.DELETED:
+                    key = self._key(login, score)
+                    self._by_login[login] = key
+                    insort(self._keys, key)
+
+            self._version = version
+
+    def lookup(self, login: str) -> Optional[int]:
+        """Место студента в общем рейтинге (с 1); вызывать после ensure"""
+        with self._lock:
+            key = self._by_login.get(login)
+            if key is None:
+                return None
+            return bisect_left(self._keys, key) + 1
+
+    async def position(self, db: AsyncSession, login: str) -> Optional[int]:
+        """Место студента в общем рейтинге (с 1)"""
+        await self.ensure(db)
+        return self.lookup(login)
+
+    async def login_at(self, db: AsyncSession, position: int) -> Optional[str]:
+        """Логин студента на заданном месте (с 1)"""
+        await self.ensure(db)
+        with self._lock:
+            if not 1 <= position <= len(self._keys):
+                return None
+            return self._keys[position - 1][1]
+
+    def __len__(self):
+        return len(self._keys)
+
+
+class PartitionRanks:
+    """
+    Места внутри школы (direction_name), группы и курса.
+    Считаются одним запросом с оконными функциями раз на версию данных,
+    дальше место любого студента берётся из словаря.
+    """
+
+    def __init__(self):
+        self._ranks = {}
+        self._version = None
+        self._rebuild_lock = asyncio.Lock()
+
+    async def ensure(self, db: AsyncSession):
+        """Пересчитывает места, если версия данных изменилась"""
+        version = await versioning.current(db)
+        if version == self._version:
+            return
+
+        async with self._rebuild_lock:
+            if version == self._version:
+                return
+
+            order = (Student.study_score.desc().nulls_last(), Student.login)
+            result = await db.execute(select(
+                Student.login,
+                func.rank().over(partition_by=Student.direction_name, order_by=order),
+                func.rank().over(partition_by=Student.student_group, order_by=order),
+                func.rank().over(partition_by=Student.study_year, order_by=order),
+            ))
+            self._ranks = {login: (school, group, year) for login, school, group, year in result}
+            self._version = version
+
+    def lookup(self, login: str) -> Tuple[Optional[int], Optional[int], Optional[int]]:
+        """(место в школе, в группе, на курсе); вызывать после ensure"""
+        return self._ranks.get(login, (None, None, None))
+
+    async def get(self, db: AsyncSession, login: str) -> Tuple[Optional[int], Optional[int], Optional[int]]:
+        await self.ensure(db)
+        return self.lookup(login)
+
+
+rank_index = RankIndex()
+versioning.on_change(rank_index.apply)
+
+partition_ranks = PartitionRanks()
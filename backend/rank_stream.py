@@ -0,0 +1,168 @@
+import asyncio
+import json
+import logging
+from collections import deque
+from typing import Optional
+from sqlalchemy import select
+from database import SessionLocal
+from models import Student
+from config import settings
+import versioning
+
+# Поток изменений рейтинга (Server-Sent Events).
+# Один фоновый опрос версии данных на процесс: когда версия меняется (ORM
+# или загрузка ingest.py из другого процесса), считается разница мест со
+# старым снимком, и компактный diff рассылается всем подключённым клиентам.
+# Последние diff-ы хранятся в журнале, чтобы переподключившийся клиент
+# получил пропущенное по номеру версии (Last-Event-ID или ?since=).
+
+logger = logging.getLogger(__name__)
+
+# Изменений больше — клиенту проще перезагрузить таблицу
+MAX_DIFF_CHANGES = 5000
+# Сколько последних версий хранится для догоняющих клиентов
+CHANGELOG_SIZE = 64
+# Очередь клиента; медленный клиент получает reset вместо накопления
+SUBSCRIBER_QUEUE_SIZE = 16
+
+
+def format_event(event: str, data: dict, event_id: Optional[int] = None) -> bytes:
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append("data: " + json.dumps(data, ensure_ascii=False, separators=(",", ":")))
+    return ("\n".join(lines) + "\n\n").encode("utf-8")
+
+
+class RankStream:
+    def __init__(self):
+        self.version: Optional[int] = None
+        self._ranks = {}
+        self._changelog = deque(maxlen=CHANGELOG_SIZE)
+        self._subscribers = set()
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop = None
+        versioning.on_change(self._on_change)
+
+    # --- ФОНОВЫЙ ОПРОС ---
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _on_change(self, version: int, changes=None):
+        # Изменение через ORM в этом процессе — проверяем сразу, не дожидаясь опроса
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Поток рейтинга: ошибка обновления")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), settings.RANK_STREAM_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def _load(self, db):
+        # Место — как в лидерборде: баллы по убыванию, затем логин
+        result = await db.execute(
+            select(Student.login, Student.study_score)
+            .order_by(Student.study_score.desc().nulls_last(), Student.login)
+        )
+        return {login: (position, score) for position, (login, score) in enumerate(result, 1)}
+
+    async def refresh(self):
+        async with SessionLocal() as db:
+            version = await versioning.current(db)
+            if version == self.version:
+                return
+            ranks = await self._load(db)
+
+        if self.version is None:
+            # Первый снимок — сравнивать не с чем
+            self._ranks, self.version = ranks, version
+            return
+
+        changes = []
+        for login, (position, score) in ranks.items():
+            old = self._ranks.get(login)
+            if old is None:
+                changes.append([login, None, position, score])
+            elif old != (position, score):
+                changes.append([login, old[0], position, score])
+        for login, (position, _) in self._ranks.items():
+            if login not in ranks:
+                changes.append([login, position, None, None])
+
+        previous = self.version
+        self._ranks, self.version = ranks, version
+
+        if len(changes) > MAX_DIFF_CHANGES:
+            event = format_event("reset", {"version": version}, version)
+        else:
+            event = format_event("diff", {"from": previous, "version": version, "changes": changes}, version)
+        self._changelog.append((previous, version, event))
+        self._publish(event)
+
+    # --- ПОДПИСЧИКИ ---
+
+    def _publish(self, event: bytes):
+        for queue in self._subscribers:
+            if queue.full():
+                # Клиент не успевает: вместо накопленного — одна команда перезагрузки
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(format_event("reset", {"version": self.version}, self.version))
+            else:
+                queue.put_nowait(event)
+
+    def backlog(self, since: Optional[int]):
+        """События, пропущенные клиентом с версией since"""
+        if since is None or since == self.version:
+            return []
+        missed = [(previous, event) for previous, version, event in self._changelog if version > since]
+        if not missed or missed[0][0] != since:
+            # Журнал не покрывает разрыв — только полная перезагрузка
+            return [format_event("reset", {"version": self.version}, self.version)]
+        return [event for _, event in missed]
+
+    async def subscribe(self, since: Optional[int] = None):
+        """Асинхронный генератор событий для одного клиента"""
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers.add(queue)
+        try:
+            yield format_event("hello", {"version": self.version})
+            for event in self.backlog(since):
+                yield event
+            while True:
+                try:
+                    yield await asyncio.wait_for(queue.get(), settings.RANK_STREAM_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    # Комментарий SSE держит соединение живым за прокси
+                    yield b": ping\n\n"
+        finally:
+            self._subscribers.discard(queue)
+
+    def __len__(self):
+        return len(self._subscribers)
+
+
+rank_stream = RankStream()
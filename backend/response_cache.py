@@ -0,0 +1,136 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from config import settings
+from single_flight import single_flight
+import versioning
+
+try:
+    import orjson
+except ImportError:  # orjson необязателен — тогда кодируем стандартным json
+    orjson = None
+
+
+class CachedResponse:
+    __slots__ = ("version", "body", "etag", "headers")
+
+    def __init__(self, version: int, body: bytes, headers: dict):
+        self.version = version
+        self.body = body
+        self.etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        self.headers = headers
+
+
+class ResponseCache:
+    """
+    LRU-кэш готовых JSON-ответов.
+    Запись действительна только для версии данных, при которой она построена;
+    размер ограничен и числом записей, и суммарным объёмом тел ответов.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, version: int) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.version != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, entry: CachedResponse):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old.body)
+            if len(entry.body) > self.max_bytes:
+                return
+
+            self._entries[key] = entry
+            self._bytes += len(entry.body)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted.body)
+
+    def clear(self, version: int = None, changes=None):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+response_cache = ResponseCache(settings.RESPONSE_CACHE_SIZE, settings.RESPONSE_CACHE_MAX_BYTES)
+# Любая запись в students делает кэш бесполезным — освобождаем память сразу
+versioning.on_change(response_cache.clear)
+
+
+def encode_json(data) -> bytes:
+    """
+    Компактный JSON в UTF-8. Обычные dict/list/str/числа кодируются напрямую
+    (orjson, если установлен), jsonable_encoder — только для остальных типов.
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(data)
+        except TypeError:
+            return orjson.dumps(jsonable_encoder(data))
+    try:
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    except TypeError:
+        return json.dumps(
+            jsonable_encoder(data), ensure_ascii=False, separators=(",", ":")
+        ).encode("utf-8")
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+async def cached_json(request: Request, key, version: int, compute: Callable, private: bool = False) -> Response:
+    """
+    Отдаёт JSON из кэша или вычисляет его через await compute().
+    key — кортеж, первый элемент которого — имя ответа ("leaderboard", ...).
+    compute возвращает данные ответа либо пару (данные, заголовки).
+    Одновременные промахи по одному ключу вычисляются один раз (single_flight.py).
+    Поддерживает If-None-Match: при совпадении ETag отвечает 304 без тела.
+    """
+    async def build():
+        data = await compute()
+        headers = {}
+        if isinstance(data, tuple):
+            data, headers = data
+        entry = CachedResponse(version, encode_json(data), headers)
+        response_cache.put(key, entry)
+        return entry
+
+    entry = response_cache.get(key, version)
+    if entry is None:
+        entry = await single_flight.do(key[0], (key, version), build)
+
+    headers = {
+        **entry.headers,
+        "ETag": entry.etag,
+        "Cache-Control": "private, no-cache" if private else "no-cache",
+    }
+    if _etag_matches(request, entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(entry.body, media_type="application/json", headers=headers)
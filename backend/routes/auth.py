@@ -1,9 +1,13 @@
 from fastapi import APIRouter, Request, HTTPException, Depends
 from fastapi.responses import RedirectResponse
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from database import get_db
+from dependencies import get_current_user as current_user
 from models import User
 from tpu_oauth import TPUOAuthService
+from student_lookup import find_student_by_email, remember_student
+from user_cache import user_cache
 from datetime import datetime, timedelta
 import uuid
 
@@ -23,7 +27,7 @@ async def callback(
     state: str = None,
     error: str = None,
     error_description: str = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Обработка callback от ТПУ OAuth"""
     try:
@@ -44,13 +48,14 @@ async def callback(
             raise HTTPException(status_code=400, detail="Код авторизации не получен")
         
         # Получаем access_token
-        token_data = TPUOAuthService.get_access_token(code)
+        token_data = await TPUOAuthService.get_access_token(code)
         
         # Получаем информацию о пользователе
-        user_info = TPUOAuthService.get_user_info(token_data["access_token"])
+        user_info = await TPUOAuthService.get_user_info(token_data["access_token"])
         
         # Сохраняем/обновляем пользователя в БД
-        user = db.query(User).filter(User.tpu_user_id == user_info.get("user_id")).first()
+        result = await db.execute(select(User).where(User.tpu_user_id == user_info.get("user_id")))
+        user = result.scalars().first()
         
         if not user:
             user = User(
@@ -69,8 +74,10 @@ async def callback(
         user.token_expires = datetime.utcnow() + timedelta(seconds=expires_in)
         
         db.add(user)
-        db.commit()
-        db.refresh(user)
+        await db.commit()
+        await db.refresh(user)
+        # Токены обновились — кэшированная копия пользователя устарела
+        user_cache.invalidate(user.id)
         
         # Сохраняем в сессии
         request.session["user_id"] = user.id
@@ -81,7 +88,9 @@ async def callback(
             "first_name": user.first_name,
             "last_name": user.last_name
         }
-        request.session["access_token"] = token_data["access_token"]
+        # Связываем пользователя со студентом сразу при входе
+        remember_student(request, await find_student_by_email(user.email, db))
+        # access_token хранится только в users, в сессию (cookie) не попадает
         
         # Очищаем state
         request.session.pop("oauth_state", None)
@@ -101,16 +110,14 @@ async def logout(request: Request):
     logout_url = TPUOAuthService.get_logout_url("http://localhost:5173")  # На ваш фронтенд
     
     # Очищаем сессию
+    user_cache.invalidate(request.session.get("user_id"))
     request.session.clear()
     
     # Перенаправляем на выход из ТПУ
     return RedirectResponse(logout_url)
 
 @router.get("/me")
-async def get_current_user(request: Request):
+async def get_current_user(request: Request, user: User = Depends(current_user)):
     """Получение информации о текущем пользователе"""
-    user_info = request.session.get("user_info")
-    if not user_info:
-        raise HTTPException(status_code=401, detail="Не авторизован")
-    
-    return user_info
\ No newline at end of file
+    # Пользователь из кэша: заодно проверяем, что он не удалён
+    return {**request.session["user_info"], **user.to_dict()}
\ No newline at end of file
@@ -1,31 +1,207 @@
 from fastapi import APIRouter, Query, Depends, HTTPException
-from sqlalchemy import asc, desc
-from sqlalchemy.orm import Session
-from database import SessionLocal
-from models import Student
-from schemas import StudentResponse
-from typing import List, Optional, Dict
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, asc, desc, and_, or_, case, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_db, SessionLocal
+from dependencies import get_current_user
+from models import User, Student, ScoreGain, Achievement
+from schemas import StudentResponse, AchievementResponse
+from rank_index import rank_index, partition_ranks
+from leaderboard_snapshot import leaderboard_snapshot
+from score_history import PERIODS
+from search_index import search_condition, tokenize
+from response_cache import cached_json, encode_json
+from student_lookup import get_session_student
+from rank_stream import rank_stream
+import versioning
+from typing import List, Optional
 from starlette.requests import Request
-from datetime import datetime, timedelta
-import random
+import base64
+import csv
+import io
+import json
 
 router = APIRouter()
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 # def get_current_user(request: Request):
 #     user = request.session.get('user')
 #     if not user:
 #         raise HTTPException(status_code=401, detail="Не авторизован")
 #     return user
 
+# Колонки, которые нужны строке лидерборда: ORM-объекты не создаются
+LEADERBOARD_COLUMNS = (
+    "login", "first_name", "last_name", "patronymic", "direction_name",
+    "faculty", "student_group", "study_year", "study_score",
+)
+
+# Поля сортировки для параметра sort_by
+SORT_FIELDS = {
+    "group": Student.student_group,
+    "school": Student.direction_name,
+    "year": Student.study_year,
+    "score": Student.study_score,
+}
+
+
+def apply_filters(query, model, search=None, school=None, group=None, min_score=None, max_score=None):
+    """Применяет фильтры лидерборда к запросу по модели (или её алиасу)"""
+    if search:
+        condition = search_condition(model, search)
+        if condition is not None:
+            query = query.filter(condition)
+
+    if school:
+        query = query.filter(model.direction_name == school)
+
+    if group:
+        query = query.filter(model.student_group == group)
+
+    if min_score is not None:
+        query = query.filter(model.study_score >= min_score)
+
+    if max_score is not None:
+        query = query.filter(model.study_score <= max_score)
+
+    return query
+
+
+def encode_cursor(value, login: str) -> str:
+    """Курсор keyset-пагинации: значение поля сортировки и логин последней строки"""
+    raw = json.dumps([value, login], ensure_ascii=False).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor: str):
+    try:
+        value, login = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Неверный cursor")
+    return value, login
+
+
+def keyset_filter(field, login_field, value, login, descending: bool):
+    """
+    Условие "строго после (value, login)" для порядка
+    field DESC NULLS LAST / ASC NULLS FIRST, затем login ASC.
+    """
+    if value is None:
+        if descending:
+            # NULL-ы в конце: дальше только NULL-ы с большим логином
+            return and_(field.is_(None), login_field > login)
+        return or_(and_(field.is_(None), login_field > login), field.isnot(None))
+
+    after_value = field < value if descending else field > value
+    condition = or_(after_value, and_(field == value, login_field > login))
+    if descending:
+        condition = or_(condition, field.is_(None))
+    return condition
+
+
+def leaderboard_query(search, school, group, min_score, max_score, order_name: str, descending: bool):
+    """
+    Запрос лидерборда с фильтрами и сортировкой (строки: колонки LEADERBOARD_COLUMNS).
+    Возвращает запрос, модель и поле сортировки. Запрос идёт прямо по students,
+    чтобы фильтры и сортировка шли по индексам (migrations.py); место
+    в общем рейтинге берётся из rank_index.
+    """
+    query = select(*(getattr(Student, name) for name in LEADERBOARD_COLUMNS))
+    query = apply_filters(query, Student, search, school, group, min_score, max_score)
+
+    order_field = SORT_FIELDS[order_name]
+
+    # Применяем сортировку; логин делает порядок однозначным для курсора
+    if descending:
+        query = query.order_by(desc(order_field).nulls_last(), Student.login)
+    else:
+        query = query.order_by(asc(order_field).nulls_first(), Student.login)
+
+    return query, Student, order_field
+
+
+def leaderboard_row(s) -> dict:
+    """Строка лидерборда в формате StudentResponse; вызывать после rank_index.ensure и partition_ranks.ensure"""
+    full_name = f"{s.last_name} {s.first_name} {s.patronymic}".strip()
+    school = s.direction_name or s.faculty or "Не указано"
+    score = float(s.study_score) if s.study_score is not None else 0.0
+    school_rank, group_rank, year_rank = partition_ranks.lookup(s.login)
+
+    return {
+        "Место": rank_index.lookup(s.login),
+        "ФИО": full_name,
+        "Школа": school,
+        "Группа": s.student_group,
+        "Счет_баллов": score,
+        "login": s.login,
+        "Место_в_школе": school_rank,
+        "Место_в_группе": group_rank,
+        "Место_на_курсе": year_rank
+    }
+
+
+async def sql_page(db: AsyncSession, search, school, group, min_score, max_score,
+                   order_name: str, descending: bool, limit=None, cursor=None):
+    """Страница лидерборда запросом к БД; возвращает строки и курсор следующей страницы"""
+    query, model, order_field = leaderboard_query(
+        search, school, group, min_score, max_score, order_name, descending
+    )
+
+    if cursor:
+        value, last_login = decode_cursor(cursor)
+        query = query.filter(
+            keyset_filter(order_field, model.login, value, last_login, descending)
+        )
+
+    if limit is None:
+        return (await db.execute(query)).all(), None
+
+    rows = (await db.execute(query.limit(limit + 1))).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, order_field.key), last.login)
+
+
+async def snapshot_page(db: AsyncSession, school, group, min_score, max_score,
+                        order_name: str, descending: bool, limit=None, cursor=None):
+    """Та же страница из колоночного снимка в памяти (LEADERBOARD_ENGINE=snapshot)"""
+    query, _, _ = leaderboard_query(None, None, None, None, None, "score", True)
+    snapshot = await leaderboard_snapshot.get(db, query, SORT_FIELDS)
+
+    after = decode_cursor(cursor) if cursor else None
+    try:
+        rows, following = snapshot.page(school, group, min_score, max_score,
+                                        order_name, descending, limit, after)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Неверный cursor")
+    return rows, encode_cursor(*following) if following else None
+
+
+async def build_leaderboard(db: AsyncSession, search, school, group, min_score, max_score,
+                      order_name: str, descending: bool, limit=None, cursor=None):
+    """Строит страницу лидерборда; возвращает строки и заголовки ответа"""
+    # Поиск идёт по полнотекстовому индексу в БД, поэтому только через SQL
+    if leaderboard_snapshot.enabled and not search:
+        rows, next_cursor = await snapshot_page(db, school, group, min_score, max_score,
+                                                order_name, descending, limit, cursor)
+    else:
+        rows, next_cursor = await sql_page(db, search, school, group, min_score, max_score,
+                                           order_name, descending, limit, cursor)
+
+    headers = {}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+
+    await rank_index.ensure(db)
+    await partition_ranks.ensure(db)
+
+    result = [leaderboard_row(row) for row in rows]
+    return result, headers
+
+
 @router.get("/api/leaderboard", response_model=List[StudentResponse])
-def get_leaderboard(
+async def get_leaderboard(
     request: Request,  # <-- Теперь правильно
     search: Optional[str] = Query(None),
     school: Optional[str] = Query(None),
@@ -34,207 +210,334 @@ def get_leaderboard(
     max_score: Optional[float] = Query(None),
     sort_by: Optional[str] = Query(None),  # 'group', 'school', 'year', 'score'
     sort_order: Optional[str] = Query("desc"),  # 'asc' или 'desc'
-    db: Session = Depends(get_db),
+    limit: Optional[int] = Query(None, ge=1, le=1000),  # без limit — весь список
+    cursor: Optional[str] = Query(None),  # из заголовка X-Next-Cursor предыдущей страницы
+    db: AsyncSession = Depends(get_db),
     # user: dict = Depends(get_current_user)
 ):
-    query = db.query(Student)
+    # Нормализуем параметры: одинаковые по смыслу запросы попадают в одну запись кэша
+    search = " ".join(tokenize(search)) if search else None
+    school = school or None
+    group = group or None
+    order_name = sort_by if sort_by in SORT_FIELDS else "score"  # по умолчанию — баллы
+    descending = sort_order != "asc"
+
+    key = ("leaderboard", search, school, group, min_score, max_score,
+           order_name, descending, limit, cursor)
+    return await cached_json(
+        request, key, await versioning.current(db),
+        lambda: build_leaderboard(db, search, school, group, min_score, max_score,
+                                  order_name, descending, limit, cursor)
+    )
+
+
+# Колонки выгрузки — поля StudentResponse
+EXPORT_COLUMNS = list(StudentResponse.model_fields)
+EXPORT_BATCH_SIZE = 1000
+
+
+async def stream_export(fmt: str, search, school, group, min_score, max_score,
+                        order_name: str, descending: bool):
+    """Построчная выгрузка лидерборда серверным курсором"""
+    if fmt == "csv":
+        # BOM нужен, чтобы Excel открыл файл в UTF-8
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        buffer.write("\ufeff")
+        writer.writerow(EXPORT_COLUMNS)
+        # Заголовок уходит клиенту до выполнения запроса
+        yield buffer.getvalue().encode("utf-8")
+
+    query, _, _ = leaderboard_query(search, school, group, min_score, max_score, order_name, descending)
+
+    # Своя сессия: выгрузка живёт дольше обработчика запроса
+    async with SessionLocal() as db:
+        await rank_index.ensure(db)
+        await partition_ranks.ensure(db)
+        result = await db.stream(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+
+        async for partition in result.partitions():
+            rows = [leaderboard_row(row) for row in partition]
+            if fmt == "csv":
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                writer.writerows([row[column] for column in EXPORT_COLUMNS] for row in rows)
+                yield buffer.getvalue().encode("utf-8")
+            else:
+                yield b"".join(encode_json(row) + b"\n" for row in rows)
+
+
+@router.get("/api/leaderboard/export")
+async def export_leaderboard(
+    format: str = Query("csv"),  # 'csv' или 'ndjson'
+    search: Optional[str] = Query(None),
+    school: Optional[str] = Query(None),
+    group: Optional[str] = Query(None),
+    min_score: Optional[float] = Query(None),
+    max_score: Optional[float] = Query(None),
+    sort_by: Optional[str] = Query(None),
+    sort_order: Optional[str] = Query("desc"),
+):
+    """Выгрузка всего рейтинга с фильтрами в CSV или NDJSON"""
+    if format not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="Формат должен быть csv или ndjson")
 
-    if search:
-        search_pattern = f"%{search}%"
-        query = query.filter(
-            (Student.first_name.ilike(search_pattern)) |
-            (Student.last_name.ilike(search_pattern)) |
-            (Student.patronymic.ilike(search_pattern)) |
-            (Student.direction_name.ilike(search_pattern)) |
-            (Student.student_group.ilike(search_pattern))
-        )
+    order_name = sort_by if sort_by in SORT_FIELDS else "score"
+    media_type = "text/csv; charset=utf-8" if format == "csv" else "application/x-ndjson"
 
-    if school:
-        query = query.filter(Student.direction_name == school)
+    return StreamingResponse(
+        stream_export(format, search, school or None, group or None, min_score, max_score,
+                      order_name, sort_order != "asc"),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="leaderboard.{format}"'},
+    )
 
-    if group:
-        query = query.filter(Student.student_group == group)
 
-    if min_score is not None:
-        query = query.filter(Student.study_score >= min_score)
-
-    if max_score is not None:
-        query = query.filter(Student.study_score <= max_score)
-
-    # Определяем поле сортировки
-    order_field = None
-
-    if sort_by == "group":
-        order_field = Student.student_group
-    elif sort_by == "school":
-        order_field = Student.direction_name
-    elif sort_by == "year":
-        order_field = Student.study_year
-    elif sort_by == "score":
-        order_field = Student.study_score
-    else:
-        order_field = Student.study_score  # по умолчанию
+@router.get("/api/leaderboard/stream")
+async def stream_rank_changes(
+    request: Request,
+    since: Optional[int] = Query(None),  # версия данных, которую клиент уже видел
+):
+    """
+    Server-Sent Events с изменениями мест: diff [логин, старое место, новое место, баллы]
+    на каждую новую версию данных. При переподключении браузер сам передаёт
+    Last-Event-ID, и клиент получает пропущенные изменения или reset.
+    """
+    last_event_id = request.headers.get("last-event-id")
+    if since is None and last_event_id and last_event_id.isdigit():
+        since = int(last_event_id)
+
+    return StreamingResponse(
+        rank_stream.subscribe(since),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# Перцентили распределения баллов в ответе /api/leaderboard/facets
+FACET_PERCENTILES = (10, 25, 50, 75, 90, 99)
+
+
+async def _percentile(db: AsyncSession, score, count: int, p: float) -> float:
+    """Перцентиль с линейной интерполяцией между соседними значениями"""
+    k = (count - 1) * p / 100
+    lower = int(k)
+    values = (await db.execute(
+        select(score).where(score.isnot(None)).order_by(score).offset(lower).limit(2)
+    )).scalars().all()
+    upper = values[1] if len(values) > 1 else values[0]
+    return values[0] + (upper - values[0]) * (k - lower)
+
+
+async def _facet_list(db: AsyncSession, column) -> list:
+    """Значения столбца с числом студентов, по убыванию числа"""
+    count = func.count().label("count")
+    query = select(column, count).where(column.isnot(None)).group_by(column)
+    rows = [(value, n) for value, n in await db.execute(query) if value != ""]
+    return [
+        {"value": value, "count": n}
+        for value, n in sorted(rows, key=lambda item: (-item[1], str(item[0])))
+    ]
+
+
+async def build_facets(db: AsyncSession, search, school, group, min_score, max_score, bins: int):
+    """
+    Фасеты и распределение баллов агрегатами в SQL. Студенты без балла
+    считаются в фасетах, но не в статистике баллов — они идут в unscored.
+    """
+    query = select(
+        Student.direction_name, Student.student_group, Student.study_year, Student.study_score
+    )
+    filtered = apply_filters(query, Student, search, school, group, min_score, max_score).subquery()
+    score = filtered.c.study_score
+
+    total, scored, low, high, mean = (await db.execute(select(
+        func.count(), func.count(score), func.min(score), func.max(score), func.avg(score)
+    ).select_from(filtered))).one()
+
+    score_stats = None
+    if scored:
+        low, high = float(low), float(high)
+        width = (high - low) / bins or 1.0
+        histogram = [scored] + [0] * (bins - 1)
+        if bins > 1:
+            # Номер корзины гистограммы; последняя включает максимум
+            bucket = case(
+                *((score < low + (i + 1) * width, i) for i in range(bins - 1)),
+                else_=bins - 1
+            ).label("bucket")
+            histogram = [0] * bins
+            for i, count in await db.execute(
+                select(bucket, func.count()).where(score.isnot(None)).group_by(bucket)
+            ):
+                histogram[i] = count
+
+        score_stats = {
+            "min": low,
+            "max": high,
+            "mean": round(float(mean), 3),
+            "percentiles": {
+                f"p{p}": round(float(await _percentile(db, score, scored, p)), 3) for p in FACET_PERCENTILES
+            },
+            "histogram": [
+                {"from": round(low + i * width, 3), "to": round(low + (i + 1) * width, 3), "count": count}
+                for i, count in enumerate(histogram)
+            ],
+        }
 
-    # Применяем сортировку
-    if sort_order == "asc":
-        query = query.order_by(asc(order_field))
-    else:
-        query = query.order_by(desc(order_field))
-
-    students = query.all()
-
-    result = []
-    for idx, s in enumerate(students, 1):
-        full_name = f"{s.last_name} {s.first_name} {s.patronymic}".strip()
-        school = s.direction_name or s.faculty or "Не указано"
-        score = float(s.study_score) if s.study_score is not None else 0.0
-
-        result.append({
-            "Место": idx,
-            "ФИО": full_name,
-            "Школа": school,
-            "Группа": s.student_group,
-            "Счет_баллов": score,
-            "login": s.login
-        })
+    return {
+        "total": total,
+        "unscored": total - scored,
+        "schools": await _facet_list(db, filtered.c.direction_name),
+        "groups": await _facet_list(db, filtered.c.student_group),
+        "years": await _facet_list(db, filtered.c.study_year),
+        "score": score_stats,
+    }
 
-    return result
 
+@router.get("/api/leaderboard/facets")
+async def get_leaderboard_facets(
+    request: Request,
+    search: Optional[str] = Query(None),
+    school: Optional[str] = Query(None),
+    group: Optional[str] = Query(None),
+    min_score: Optional[float] = Query(None),
+    max_score: Optional[float] = Query(None),
+    bins: int = Query(10, ge=1, le=100),
+    db: AsyncSession = Depends(get_db)
+):
+    """Школы, группы и курсы с количеством студентов, гистограмма и перцентили баллов"""
+    search = " ".join(tokenize(search)) if search else None
+    school = school or None
+    group = group or None
 
-def find_student_by_user_email(user_email: str, db: Session) -> Optional[Student]:
-    """Находит студента по email пользователя"""
-    if not user_email:
-        return None
-    
-    # Пытаемся найти по логину (часть email до @)
-    login_from_email = user_email.split('@')[0]
-    student = db.query(Student).filter(Student.login == login_from_email).first()
-    
-    if student:
-        return student
-    
-    # Пытаемся найти по части email
-    students = db.query(Student).all()
-    for s in students:
-        # Если логин совпадает с частью email или похож
-        if s.login and login_from_email.lower() in s.login.lower():
-            return s
-    
-    return None
+    key = ("facets", search, school, group, min_score, max_score, bins)
+    return await cached_json(
+        request, key, await versioning.current(db),
+        lambda: build_facets(db, search, school, group, min_score, max_score, bins)
+    )
 
 
 @router.get("/api/user/rank")
-def get_user_rank(
+async def get_user_rank(
     request: Request,
-    db: Session = Depends(get_db)
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """Получает место текущего пользователя в рейтинге"""
-    user_info = request.session.get("user_info")
-    if not user_info:
-        raise HTTPException(status_code=401, detail="Не авторизован")
-    
-    user_email = user_info.get("email", "")
-    student = find_student_by_user_email(user_email, db)
+    student = await get_session_student(request, db)
     
     if not student:
         # Если студент не найден, возвращаем пустой ответ
         return None
     
-    # Получаем всех студентов, отсортированных по баллам
-    all_students = db.query(Student).order_by(desc(Student.study_score)).all()
-    
-    # Находим место студента
-    position = 1
-    for idx, s in enumerate(all_students, 1):
-        if s.login == student.login:
-            position = idx
-            break
-    
-    full_name = f"{student.last_name} {student.first_name} {student.patronymic}".strip()
-    score = float(student.study_score) if student.study_score is not None else 0.0
+    async def compute():
+        # Место студента берём из индекса рейтинга
+        position = await rank_index.position(db, student.login)
+        
+        full_name = f"{student.last_name} {student.first_name} {student.patronymic}".strip()
+        score = float(student.study_score) if student.study_score is not None else 0.0
+        
+        return {
+            "position": position,
+            "firstName": student.first_name or user.first_name or "",
+            "lastName": student.last_name or user.last_name or "",
+            "fullName": full_name,
+            "score": round(score, 1)
+        }
     
-    return {
-        "position": position,
-        "firstName": student.first_name or user_info.get("first_name", ""),
-        "lastName": student.last_name or user_info.get("last_name", ""),
-        "fullName": full_name,
-        "score": round(score, 1)
-    }
+    key = ("user_rank", student.login, user.first_name, user.last_name)
+    return await cached_json(request, key, await versioning.current(db), compute, private=True)
 
 
 @router.get("/api/top-weekly")
-def get_top_weekly(
-    db: Session = Depends(get_db)
+async def get_top_weekly(
+    request: Request,
+    period: str = Query("week"),  # 'week' или 'month'
+    db: AsyncSession = Depends(get_db)
 ):
     """Получает топ-3 студентов за неделю (по баллам, заработанным за неделю)"""
-    # Получаем всех студентов, отсортированных по баллам
-    all_students = db.query(Student).order_by(desc(Student.study_score)).limit(10).all()
-    
-    # Генерируем топ-3 на основе случайных данных (так как нет истории)
-    # В реальном проекте здесь должна быть таблица истории баллов
+    if period not in PERIODS:
+        raise HTTPException(status_code=400, detail="Неизвестный период")
+
+    return await cached_json(
+        request, ("top_weekly", period), await versioning.current(db),
+        lambda: build_top_weekly(db, period)
+    )
+
+
+async def build_top_weekly(db: AsyncSession, period: str):
+    # Прирост посчитан заранее при снимке истории баллов (score_history.py)
+    result = await db.execute(
+        select(
+            Student.last_name, Student.first_name, Student.patronymic, Student.login,
+            ScoreGain.points_gained, ScoreGain.positions_gained
+        )
+        .join(Student, Student.login == ScoreGain.login)
+        .where(ScoreGain.period == period, ScoreGain.points_gained > 0)
+        .order_by(ScoreGain.points_gained.desc(), ScoreGain.login)
+        .limit(3)
+    )
+
     top_weekly = []
-    
-    for i, student in enumerate(all_students[:10]):  # Берем топ-10 и выбираем случайных
-        if len(top_weekly) >= 3:
-            break
-        
-        full_name = f"{student.last_name} {student.first_name} {student.patronymic}".strip()
-        
-        # Генерируем случайные данные для демонстрации
-        points_gained = random.randint(15, 30)
-        positions_gained = random.randint(3, 15)
-        
+    for last_name, first_name, patronymic, login, points_gained, positions_gained in result:
+        full_name = f"{last_name} {first_name} {patronymic}".strip()
+
         top_weekly.append({
             "name": full_name,
-            "login": student.login,
-            "pointsGained": points_gained,
+            "login": login,
+            "pointsGained": round(points_gained, 1),
             "positionsGained": positions_gained
         })
-    
-    return top_weekly[:3]
+
+    return top_weekly
 
 
-@router.get("/api/achievements")
-def get_achievements(
+@router.get("/api/achievements", response_model=List[AchievementResponse])
+async def get_achievements(
     request: Request,
-    db: Session = Depends(get_db)
+    login: Optional[str] = Query(None),  # только достижения этого студента
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None),  # из заголовка X-Next-Cursor предыдущей страницы
+    db: AsyncSession = Depends(get_db)
 ):
-    """Получает последние достижения"""
-    achievements = []
-    
-    # Получаем текущего пользователя (может быть не авторизован)
-    user_info = request.session.get("user_info")
-    user_email = user_info.get("email", "") if user_info else ""
-    
-    # Генерируем тестовые достижения
-    # В реальном проекте это должно быть из таблицы достижений
-    
-    if user_email:
-        student = find_student_by_user_email(user_email, db)
-        if student:
-            full_name = f"{student.last_name} {student.first_name} {student.patronymic}".strip()
-            
-            achievements.append({
-                "type": "position",
-                "text": f"{student.first_name} {student.last_name} поднялся на 5 позиций.",
-                "time": "2 часа назад"
-            })
-    
-    # Добавляем общие достижения (даже если пользователь не авторизован)
-    achievements.extend([
-        {
-            "type": "badge",
-            "text": "Анна Смирнова получила значок \"Проектный гуру\".",
-            "time": "вчера"
-        },
+    """Лента достижений, новые — первыми (находятся при загрузке данных, см. achievements.py)"""
+    try:
+        before = int(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Неверный cursor")
+
+    key = ("achievements", login, limit, before)
+    return await cached_json(
+        request, key, await versioning.current(db),
+        lambda: build_achievements(db, login, limit, before)
+    )
+
+
+async def build_achievements(db: AsyncSession, login: Optional[str], limit: int, before: Optional[int]):
+    query = select(Achievement).order_by(Achievement.id.desc()).limit(limit + 1)
+    if login:
+        query = query.where(Achievement.login == login)
+    if before is not None:
+        query = query.where(Achievement.id < before)
+
+    rows = (await db.execute(query)).scalars().all()
+    headers = {}
+    if len(rows) > limit:
+        rows = rows[:limit]
+        headers["X-Next-Cursor"] = str(rows[-1].id)
+
+    return [
         {
-            "type": "streak",
-            "text": "Дмитрий Соколов удерживает топ-10 уже 3 недели.",
-            "time": "2 дня назад"
+            "id": row.id,
+            "type": row.kind,
+            "login": row.login,
+            "text": row.text,
+            "value": row.value,
+            "createdAt": row.created_at.isoformat(),
         }
-    ])
-    
-    return achievements[:3]  # Возвращаем последние 3
+        for row in rows
+    ], headers
 
 
 # from fastapi import APIRouter, Query, Depends, HTTPException
@@ -1,36 +1,36 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
-from database import SessionLocal
-from models import Student
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_db
+from models import Student, Team, Project, Membership, TeamScore
+from rank_index import rank_index, partition_ranks
+from routes.teams import team_position, team_name, contribution, teams_version
+from single_flight import single_flight
+from team_scores import STUDENT_ROLE
+from datetime import date
 import random
 
 router = APIRouter()
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 @router.get("/api/profile/{login}")
-def get_profile(
+async def get_profile(
     login: str, 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Получение полного профиля пользователя (доступен без авторизации)"""
-    student = db.query(Student).filter(Student.login == login).first()
+    # Одновременные открытия одного профиля считаются один раз
+    key = (login, await teams_version(db))
+    return await single_flight.do("profile", key, lambda: build_profile(db, login))
+
+
+async def build_profile(db: AsyncSession, login: str):
+    student = await db.get(Student, login)
     if not student:
         raise HTTPException(status_code=404, detail="Студент не найден")
     
     # Получаем место в рейтинге
-    all_students = db.query(Student).order_by(desc(Student.study_score)).all()
-    position = 1
-    for idx, s in enumerate(all_students, 1):
-        if s.login == student.login:
-            position = idx
-            break
+    position = await rank_index.position(db, student.login)
+    school_rank, group_rank, year_rank = await partition_ranks.get(db, student.login)
     
     full_name = f"{student.last_name} {student.first_name} {student.patronymic}".strip()
     school = student.direction_name or student.faculty or "Не указано"
@@ -39,25 +39,40 @@ def get_profile(
     # Определяем роль (пока только студент, позже можно добавить ментора)
     roles = ["Студент"]
     
-    # Генерируем статистику (в реальном проекте это должно быть из отдельных таблиц)
-    # Для MVP используем демо-данные
-    projects_count = random.randint(2, 8)
-    average_performance = round(score / 300 * 5, 2) if score > 0 else 0  # Примерная успеваемость
-    total_hours = random.randint(100, 500)
-    team_position = random.randint(1, 20) if random.random() > 0.3 else None  # Может быть без команды
-    team_contribution = round(random.uniform(15, 45), 1) if team_position else None
-    
-    # Команды и проекты (демо-данные)
+    # Команды и проекты студента, последняя — первой
+    memberships = (await db.execute(
+        select(Membership, Team, TeamScore.score_sum, Project.project_name)
+        .join(Team, Team.team_id == Membership.team_id)
+        .outerjoin(TeamScore, TeamScore.team_id == Team.team_id)
+        .outerjoin(Project, Project.id_project == Team.project_id)
+        .where(Membership.student_login == student.login)
+        .order_by(Team.period_start.desc().nulls_last(), Team.team_id.desc())
+    )).all()
+
+    today = date.today()
     projects = []
-    for i in range(projects_count):
+    for membership, team, score_sum, project_name in memberships:
+        started = team.period_start or (membership.joined_date.date() if membership.joined_date else today)
+        finished = min(team.period_end, today) if team.period_end else today
+        months = max(1, (finished.year - started.year) * 12 + finished.month - started.month)
         projects.append({
-            "name": f"Проект {i + 1}",
-            "team": f"Команда {i + 1}",
-            "status": "Завершен" if i < projects_count - 1 else "Текущий",
-            "participation_time": f"{random.randint(1, 12)} месяцев",
-            "role": random.choice(["Разработчик", "Дизайнер", "Аналитик", "Тестировщик", "Менеджер"]),
-            "team_link": f"/team/{i + 1}"
+            "name": project_name or "Не указано",
+            "team": team_name(team.team_id, project_name),
+            "status": "Завершен" if team.period_end and team.period_end < today else "Текущий",
+            "participation_time": f"{months} мес.",
+            "role": membership.rol,
+            "team_link": f"/team/{team.team_id}"
         })
+
+    # Место команды и вклад — по текущей команде, где студент — участник
+    current = next((row for row in memberships if row[0].rol == STUDENT_ROLE), None)
+    team_rank = await team_position(db, current[1].team_id) if current else None
+    team_contribution = contribution(student.study_score, current[2]) if current else None
+
+    # Остальная статистика пока демонстрационная
+    projects_count = len(projects)
+    average_performance = round(score / 300 * 5, 2) if score > 0 else 0  # Примерная успеваемость
+    total_hours = random.randint(100, 500)
     
     # Данные для графиков (демо)
     weeks_data = []
@@ -94,7 +109,10 @@ def get_profile(
             "averagePerformance": average_performance,
             "totalHours": total_hours,
             "individualRank": position,
-            "teamRank": team_position,
+            "schoolRank": school_rank,
+            "groupRank": group_rank,
+            "courseRank": year_rank,
+            "teamRank": team_rank,
             "teamContribution": team_contribution,
             "currentScore": round(score, 1)
         },
@@ -0,0 +1,165 @@
+from fastapi import APIRouter, Query, Depends, HTTPException
+from sqlalchemy import select, desc, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.requests import Request
+from typing import List, Optional
+from database import get_db
+from models import Student, Team, Project, Membership, TeamScore
+from schemas import TeamResponse
+from response_cache import cached_json
+from routes.leaderboard import encode_cursor, decode_cursor, keyset_filter
+from team_scores import TEAMS, STUDENT_ROLE
+import versioning
+
+router = APIRouter()
+
+# Показатель рейтинга команд для параметра rank_by
+TEAM_RANK_FIELDS = {
+    "avg": TeamScore.score_avg,
+    "sum": TeamScore.score_sum,
+}
+
+
+async def teams_version(db: AsyncSession):
+    """Рейтинг команд зависит и от баллов студентов, и от состава команд"""
+    return await versioning.current(db), await versioning.current(db, TEAMS)
+
+
+def contribution(score, score_sum) -> Optional[float]:
+    """Вклад участника в сумму баллов команды, %"""
+    if score is None or not score_sum:
+        return None
+    return round(float(score) / score_sum * 100, 1)
+
+
+def team_name(team_id: int, project_name: Optional[str]) -> str:
+    return project_name or f"Команда {team_id}"
+
+
+async def team_position(db: AsyncSession, team_id: int, rank_by: str = "avg") -> Optional[int]:
+    """Место команды в рейтинге: число команд с лучшим показателем + 1"""
+    field = TEAM_RANK_FIELDS[rank_by]
+    value = (await db.execute(select(field).where(TeamScore.team_id == team_id))).scalar()
+    if value is None:
+        return None
+    better = (await db.execute(
+        select(func.count()).select_from(TeamScore).where(field > value)
+    )).scalar()
+    return better + 1
+
+
+async def build_teams(db: AsyncSession, rank_by: str, limit=None, cursor=None):
+    field = TEAM_RANK_FIELDS[rank_by]
+
+    # Место — по всем командам, до пагинации
+    place = func.rank().over(order_by=desc(field).nulls_last()).label("place")
+    ranked = (
+        select(
+            TeamScore.team_id, TeamScore.member_count, TeamScore.score_sum, TeamScore.score_avg,
+            Team.expert_score, Team.period_start, Team.period_end, Project.project_name, place,
+        )
+        .join(Team, Team.team_id == TeamScore.team_id)
+        .outerjoin(Project, Project.id_project == Team.project_id)
+        .subquery()
+    )
+    order_field = ranked.c[field.key]
+
+    query = select(ranked).order_by(desc(order_field).nulls_last(), ranked.c.team_id)
+    if cursor:
+        value, last_id = decode_cursor(cursor)
+        query = query.filter(keyset_filter(order_field, ranked.c.team_id, value, last_id, True))
+
+    headers = {}
+    if limit is not None:
+        rows = (await db.execute(query.limit(limit + 1))).all()
+        if len(rows) > limit:
+            rows = rows[:limit]
+            headers["X-Next-Cursor"] = encode_cursor(getattr(rows[-1], field.key), rows[-1].team_id)
+    else:
+        rows = (await db.execute(query)).all()
+
+    result = []
+    for row in rows:
+        score = getattr(row, field.key)
+        result.append({
+            "position": row.place,
+            "id": row.team_id,
+            "name": team_name(row.team_id, row.project_name),
+            "score": round(score, 2) if score is not None else None,
+            "members": row.member_count,
+            "scoreSum": round(row.score_sum, 2),
+            "scoreAvg": round(row.score_avg, 2) if row.score_avg is not None else None,
+            "expertScore": row.expert_score,
+            "periodStart": row.period_start.isoformat() if row.period_start else None,
+            "periodEnd": row.period_end.isoformat() if row.period_end else None,
+        })
+    return result, headers
+
+
+@router.get("/api/teams", response_model=List[TeamResponse])
+async def get_teams(
+    request: Request,
+    rank_by: str = Query("avg"),  # 'avg' — средний балл участников, 'sum' — сумма
+    limit: Optional[int] = Query(None, ge=1, le=1000),  # без limit — весь список
+    cursor: Optional[str] = Query(None),  # из заголовка X-Next-Cursor предыдущей страницы
+    db: AsyncSession = Depends(get_db)
+):
+    """Рейтинг команд по баллам участников"""
+    if rank_by not in TEAM_RANK_FIELDS:
+        raise HTTPException(status_code=400, detail="rank_by должен быть avg или sum")
+
+    return await cached_json(
+        request, ("teams", rank_by, limit, cursor), await teams_version(db),
+        lambda: build_teams(db, rank_by, limit, cursor)
+    )
+
+
+@router.get("/api/teams/{team_id}")
+async def get_team(
+    request: Request,
+    team_id: int,
+    db: AsyncSession = Depends(get_db)
+):
+    """Команда с участниками и их вкладом в баллы команды"""
+    async def compute():
+        row = (await db.execute(
+            select(Team, TeamScore, Project.project_name)
+            .outerjoin(TeamScore, TeamScore.team_id == Team.team_id)
+            .outerjoin(Project, Project.id_project == Team.project_id)
+            .where(Team.team_id == team_id)
+        )).first()
+        if row is None:
+            raise HTTPException(status_code=404, detail="Команда не найдена")
+        team, score, project_name = row
+        score_sum = score.score_sum if score else 0.0
+
+        members = []
+        result = await db.execute(
+            select(Membership.rol, Student.login, Student.last_name, Student.first_name,
+                   Student.patronymic, Student.study_score)
+            .join(Student, Student.login == Membership.student_login)
+            .where(Membership.team_id == team_id)
+            .order_by(Student.study_score.desc().nulls_last(), Student.login)
+        )
+        for role, login, last_name, first_name, patronymic, study_score in result:
+            members.append({
+                "login": login,
+                "name": f"{last_name} {first_name} {patronymic}".strip(),
+                "role": role,
+                "score": float(study_score) if study_score is not None else None,
+                "contribution": contribution(study_score, score_sum) if role == STUDENT_ROLE else None,
+            })
+
+        return {
+            "id": team.team_id,
+            "name": team_name(team.team_id, project_name),
+            "position": await team_position(db, team_id),
+            "members": members,
+            "scoreSum": round(score_sum, 2),
+            "scoreAvg": round(score.score_avg, 2) if score and score.score_avg is not None else None,
+            "expertScore": team.expert_score,
+            "periodStart": team.period_start.isoformat() if team.period_start else None,
+            "periodEnd": team.period_end.isoformat() if team.period_end else None,
+        }
+
+    return await cached_json(request, ("team", team_id), await teams_version(db), compute)
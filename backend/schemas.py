@@ -1,4 +1,5 @@
 from pydantic import BaseModel
+from typing import Optional
 
 class StudentResponse(BaseModel):
     Место: int
@@ -7,6 +8,31 @@ class StudentResponse(BaseModel):
     Группа: str
     Счет_баллов: float
     login: str = None
+    Место_в_школе: Optional[int] = None
+    Место_в_группе: Optional[int] = None
+    Место_на_курсе: Optional[int] = None
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+class AchievementResponse(BaseModel):
+    id: int
+    type: str
+    login: str
+    text: str
+    value: Optional[float] = None
+    createdAt: str
+
+
+class TeamResponse(BaseModel):
+    position: Optional[int] = None
+    id: int
+    name: str
+    score: Optional[float] = None
+    members: int
+    scoreSum: float
+    scoreAvg: Optional[float] = None
+    expertScore: Optional[str] = None
+    periodStart: Optional[str] = None
+    periodEnd: Optional[str] = None
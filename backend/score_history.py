@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import select, insert, delete, func, literal, and_
+from models import Student, ScoreSnapshot, ScoreHistory, ScoreGain
+from config import settings
+
+# История баллов.
+# При каждом обновлении данных сохраняется снимок баллов и мест всех
+# студентов, и тут же пересчитывается прирост за каждый период относительно
+# снимка, сделанного не позже начала периода. Запросы читают готовые
+# значения из score_gains.
+
+PERIODS = {
+    "week": timedelta(days=7),
+    "month": timedelta(days=30),
+}
+
+
+def _baseline(conn, snapshot_id: int, since: datetime) -> Optional[int]:
+    """Последний снимок не позже since, а если такого нет — самый ранний"""
+    baseline = conn.execute(
+        select(ScoreSnapshot.id)
+        .where(ScoreSnapshot.taken_at <= since, ScoreSnapshot.id != snapshot_id)
+        .order_by(ScoreSnapshot.taken_at.desc())
+        .limit(1)
+    ).scalar()
+    if baseline is None:
+        baseline = conn.execute(
+            select(ScoreSnapshot.id)
+            .where(ScoreSnapshot.id != snapshot_id)
+            .order_by(ScoreSnapshot.taken_at)
+            .limit(1)
+        ).scalar()
+    return baseline
+
+
+def take_snapshot(conn, data_version: int = None, taken_at: datetime = None) -> int:
+    """Сохраняет снимок баллов и пересчитывает прирост за периоды (синхронное соединение)"""
+    taken_at = taken_at or datetime.utcnow()
+
+    snapshot_id = conn.execute(
+        insert(ScoreSnapshot).values(taken_at=taken_at, data_version=data_version)
+    ).inserted_primary_key[0]
+
+    # Место — как в индексе рейтинга: баллы по убыванию, затем логин
+    position = func.row_number().over(
+        order_by=(Student.study_score.desc().nulls_last(), Student.login)
+    )
+    conn.execute(
+        insert(ScoreHistory).from_select(
+            ["snapshot_id", "login", "study_score", "position"],
+            select(literal(snapshot_id), Student.login, Student.study_score, position)
+        )
+    )
+
+    current = ScoreHistory.__table__.alias("cur")
+    base = ScoreHistory.__table__.alias("base")
+
+    for period, length in PERIODS.items():
+        conn.execute(delete(ScoreGain).where(ScoreGain.period == period))
+
+        baseline_id = _baseline(conn, snapshot_id, taken_at - length)
+        if baseline_id is None:
+            continue
+
+        conn.execute(
+            insert(ScoreGain).from_select(
+                ["period", "login", "points_gained", "positions_gained", "snapshot_id"],
+                select(
+                    literal(period),
+                    current.c.login,
+                    func.coalesce(current.c.study_score, 0) - func.coalesce(base.c.study_score, 0),
+                    base.c.position - current.c.position,
+                    literal(snapshot_id),
+                )
+                .join(base, and_(base.c.login == current.c.login, base.c.snapshot_id == baseline_id))
+                .where(current.c.snapshot_id == snapshot_id)
+            )
+        )
+
+    _prune(conn, taken_at)
+    return snapshot_id
+
+
+def _prune(conn, now: datetime):
+    """Удаляет снимки старше SCORE_HISTORY_DAYS"""
+    expired = select(ScoreSnapshot.id).where(
+        ScoreSnapshot.taken_at < now - timedelta(days=settings.SCORE_HISTORY_DAYS)
+    )
+    conn.execute(delete(ScoreHistory).where(ScoreHistory.snapshot_id.in_(expired)))
+    conn.execute(delete(ScoreSnapshot).where(ScoreSnapshot.id.in_(expired)))
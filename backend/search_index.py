@@ -0,0 +1,142 @@
+import logging
+import re
+from sqlalchemy import text, select, func, and_, or_
+from sqlalchemy.exc import OperationalError
+from models import Student
+
+# Полнотекстовый индекс по студентам (SQLite FTS5).
+# Таблица students_fts хранит только индекс, данные читаются из students,
+# синхронизация — триггерами на вставку, изменение и удаление.
+# unicode61 не считает ё и е одной буквой, поэтому в индекс и в запрос
+# попадает текст с ё, заменённой на е: «федоров» находит «Фёдоров».
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = "students_fts"
+FTS_COLUMNS = ("last_name", "first_name", "patronymic", "direction_name", "student_group")
+
+# Включается в ensure_search_index, если БД поддерживает FTS5
+_fts_enabled = False
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def _columns(prefix: str = "") -> str:
+    return ", ".join(f"{prefix}{column}" for column in FTS_COLUMNS)
+
+
+def _folded(prefix: str = "") -> str:
+    """Значения колонок для индекса: ё -> е (регистр приводит сам unicode61)"""
+    return ", ".join(
+        f"replace(replace({prefix}{column}, 'ё', 'е'), 'Ё', 'Е')" for column in FTS_COLUMNS
+    )
+
+
+def _create_triggers(conn):
+    for name in ("students_fts_ai", "students_fts_ad", "students_fts_au"):
+        conn.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+
+    conn.execute(text(f"""
+        CREATE TRIGGER students_fts_ai AFTER INSERT ON students BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, {_columns()})
+            VALUES (new.rowid, {_folded("new.")});
+        END
+    """))
+    conn.execute(text(f"""
+        CREATE TRIGGER students_fts_ad AFTER DELETE ON students BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_columns()})
+            VALUES ('delete', old.rowid, {_folded("old.")});
+        END
+    """))
+    conn.execute(text(f"""
+        CREATE TRIGGER students_fts_au AFTER UPDATE ON students BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_columns()})
+            VALUES ('delete', old.rowid, {_folded("old.")});
+            INSERT INTO {FTS_TABLE}(rowid, {_columns()})
+            VALUES (new.rowid, {_folded("new.")});
+        END
+    """))
+
+
+def _fill(conn):
+    # Не 'rebuild': он берёт текст из students как есть, без замены ё
+    conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('delete-all')"))
+    conn.execute(text(
+        f"INSERT INTO {FTS_TABLE}(rowid, {_columns()}) SELECT rowid, {_folded()} FROM students"
+    ))
+
+
+def ensure_search_index(conn) -> bool:
+    """Создаёт FTS5-индекс и триггеры синхронизации, если их ещё нет"""
+    global _fts_enabled
+
+    if conn.dialect.name != "sqlite":
+        return False
+
+    exists = conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {"name": FTS_TABLE}
+    ).first()
+
+    if not exists:
+        try:
+            # unicode61 приводит к нижнему регистру в том числе кириллицу
+            conn.execute(text(
+                f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+                f"{_columns()}, content='students', content_rowid='rowid', "
+                f"tokenize='unicode61 remove_diacritics 2')"
+            ))
+        except OperationalError:
+            logger.exception("FTS5 недоступен, поиск работает без индекса")
+            return False
+
+        _create_triggers(conn)
+        _fill(conn)
+
+    _fts_enabled = True
+    return True
+
+
+def rebuild_search_index(conn):
+    """Полностью перестраивает индекс (например, после VACUUM, меняющего rowid)"""
+    if _fts_enabled:
+        _fill(conn)
+
+
+def refold_search_index(conn):
+    """Пересоздаёт триггеры и индекс с заменой ё -> е в уже созданной БД"""
+    if ensure_search_index(conn):
+        _create_triggers(conn)
+        _fill(conn)
+
+
+def tokenize(search: str) -> list:
+    """Разбивает поисковую строку на слова в нижнем регистре, ё -> е"""
+    return _TOKEN_RE.findall(search.lower().replace("ё", "е"))
+
+
+def search_condition(model, search: str):
+    """
+    Условие поиска по ФИО, школе и группе для модели (или её алиаса).
+    Каждое слово должно совпасть с началом какого-либо слова в записи:
+    "Иванов 8К21" найдёт Иванова из группы 8К21.
+    """
+    terms = tokenize(search)
+    if not terms:
+        return None
+
+    if _fts_enabled:
+        match = " ".join(f'"{term}"*' for term in terms)
+        matched = select(Student.login).where(text(
+            f"students.rowid IN (SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match)"
+        ).bindparams(match=match))
+        return model.login.in_(matched)
+
+    # Без индекса: каждое слово ищется подстрокой в любом из полей.
+    # Регистр приводим явно: ilike в SQLite не знает кириллицу, а lower()
+    # для SQLite подменяется на юникодный (database.py)
+    fields = [func.replace(func.lower(getattr(model, column)), "ё", "е") for column in FTS_COLUMNS]
+    return and_(*(
+        or_(*(field.contains(term, autoescape=True) for field in fields))
+        for term in terms
+    ))
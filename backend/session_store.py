@@ -0,0 +1,100 @@
+import json
+import secrets
+from datetime import datetime, timedelta
+import itsdangerous
+from itsdangerous.exc import BadSignature
+from sqlalchemy import delete
+from starlette.datastructures import MutableHeaders
+from starlette.requests import HTTPConnection
+from database import SessionLocal
+from models import ServerSession
+
+# Серверное хранилище сессий (SESSION_STORE=server).
+# В cookie лежит только подписанный идентификатор, данные сессии — в таблице
+# server_sessions, поэтому user_info не передаётся с каждым запросом и одна
+# сессия видна всем процессам. Интерфейс request.session тот же, что у
+# starlette SessionMiddleware.
+
+
+class ServerSessionMiddleware:
+    def __init__(self, app, secret_key: str, session_cookie: str = "session",
+                 max_age: int = 14 * 24 * 60 * 60, same_site: str = "lax", https_only: bool = False):
+        self.app = app
+        self.signer = itsdangerous.TimestampSigner(str(secret_key))
+        self.session_cookie = session_cookie
+        self.max_age = max_age
+        self.security_flags = "httponly; samesite=" + same_site
+        if https_only:
+            self.security_flags += "; secure"
+
+    async def _load(self, session_id: str):
+        async with SessionLocal() as db:
+            stored = await db.get(ServerSession, session_id)
+            if stored is None or stored.expires_at < datetime.utcnow():
+                return None
+            return json.loads(stored.data)
+
+    async def _save(self, session_id: str, data: dict, previous_id: str = None):
+        now = datetime.utcnow()
+        async with SessionLocal() as db:
+            if previous_id:
+                await db.execute(delete(ServerSession).where(ServerSession.id == previous_id))
+            else:
+                # Новая сессия — заодно удаляем истёкшие
+                await db.execute(delete(ServerSession).where(ServerSession.expires_at < now))
+            await db.merge(ServerSession(
+                id=session_id,
+                data=json.dumps(data, ensure_ascii=False),
+                expires_at=now + timedelta(seconds=self.max_age),
+            ))
+            await db.commit()
+
+    async def _delete(self, session_id: str):
+        async with SessionLocal() as db:
+            await db.execute(delete(ServerSession).where(ServerSession.id == session_id))
+            await db.commit()
+
+    def _cookie(self, value: str, expires: str) -> str:
+        return f"{self.session_cookie}={value}; path=/; {expires}; {self.security_flags}"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        connection = HTTPConnection(scope)
+        session_id = None
+        initial = {}
+
+        cookie = connection.cookies.get(self.session_cookie)
+        if cookie:
+            try:
+                session_id = self.signer.unsign(cookie.encode(), max_age=self.max_age).decode()
+            except BadSignature:
+                session_id = None
+            if session_id:
+                initial = await self._load(session_id)
+                if initial is None:
+                    session_id, initial = None, {}
+
+        scope["session"] = json.loads(json.dumps(initial))
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                session = scope["session"]
+                if session != initial:
+                    headers = MutableHeaders(scope=message)
+                    if session:
+                        # Вход под другим пользователем — новый идентификатор (защита от фиксации сессии)
+                        rotate = session_id is None or session.get("user_id") != initial.get("user_id")
+                        new_id = secrets.token_urlsafe(32) if rotate else session_id
+                        await self._save(new_id, session, previous_id=session_id if rotate else None)
+                        if rotate:
+                            signed = self.signer.sign(new_id.encode()).decode()
+                            headers.append("Set-Cookie", self._cookie(signed, f"Max-Age={self.max_age}"))
+                    elif session_id:
+                        await self._delete(session_id)
+                        headers.append("Set-Cookie", self._cookie("null", "expires=Thu, 01 Jan 1970 00:00:00 GMT"))
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
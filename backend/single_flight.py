@@ -0,0 +1,58 @@
+import asyncio
+from collections import Counter
+
+# Объединение одинаковых одновременных запросов (single-flight).
+# Пока ответ для ключа считается, повторные запросы с тем же ключом не
+# начинают своё вычисление, а ждут результата первого — в начале семестра
+# сотни одинаковых открытий лидерборда выполняют один запрос к БД.
+# Результат не хранится после завершения: это делают кэши ответов.
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls = {}
+        # Имя вычисления (leaderboard, top_weekly, profile, ...) -> число
+        self.executed = Counter()
+        self.coalesced = Counter()
+
+    async def do(self, name: str, key, compute):
+        """Результат await compute(); одновременные вызовы с тем же ключом получают общий"""
+        key = (name, key)
+        while True:
+            call = self._calls.get(key)
+            if call is None:
+                break
+            self.coalesced[name] += 1
+            try:
+                # shield: отмена ожидающего запроса не отменяет общее вычисление
+                return await asyncio.shield(call)
+            except asyncio.CancelledError:
+                if not call.cancelled():
+                    raise
+                # Отменён запрос, который считал результат, — считаем сами
+
+        call = asyncio.get_running_loop().create_future()
+        self._calls[key] = call
+        self.executed[name] += 1
+        try:
+            result = await compute()
+        except asyncio.CancelledError:
+            call.cancel()
+            raise
+        except Exception as e:
+            call.set_exception(e)
+            # Ожидающих может не быть — иначе asyncio предупредит о непрочитанной ошибке
+            call.exception()
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+
+    def __len__(self):
+        return len(self._calls)
+
+
+single_flight = SingleFlight()
@@ -0,0 +1,127 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+from typing import Optional
+from fastapi import Request, Response
+from fastapi.responses import FileResponse
+
+try:
+    import brotli
+except ImportError:  # brotli необязателен — тогда отдаём только gzip
+    brotli = None
+
+# Манифест статических файлов фронтенда.
+# Собирается один раз при старте: содержимое небольших файлов, их сжатые
+# варианты и ETag держатся в памяти, поэтому при запросе не нужно
+# обращаться к файловой системе.
+
+INLINE_LIMIT = 512 * 1024  # файлы больше отдаются с диска
+MIN_COMPRESS_SIZE = 1024
+
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml",
+                      "font/otf", "font/ttf", "application/manifest+json")
+
+# Vite кладёт собранные файлы в assets/ и добавляет к имени хэш содержимого:
+# assets/index-DiwrgTda.js. Файлы из public/ копируются в корень без хэша —
+# их может поменять следующая сборка, поэтому они проверяются по ETag.
+BUILD_ASSETS_DIR = "assets/"
+HASHED_NAME_RE = re.compile(r"-[A-Za-z0-9_-]{8}\.[a-z0-9]+$")
+
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "no-cache"
+
+for _ext, _type in ((".js", "application/javascript"), (".mjs", "application/javascript"),
+                    (".otf", "font/otf"), (".ttf", "font/ttf"), (".woff", "font/woff"),
+                    (".woff2", "font/woff2"), (".svg", "image/svg+xml"), (".map", "application/json")):
+    mimetypes.add_type(_type, _ext)
+
+
+class Asset:
+    __slots__ = ("path", "media_type", "etag", "cache_control", "body", "gzip", "br", "stat")
+
+    def __init__(self, path: str, data: bytes, stat, immutable: bool, inline: bool):
+        self.path = path
+        self.media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        self.etag = '"' + hashlib.sha1(data).hexdigest() + '"'
+        self.cache_control = IMMUTABLE_CACHE if immutable else REVALIDATE_CACHE
+        self.stat = stat
+        self.body = data if inline else None
+        self.gzip = None
+        self.br = None
+
+        if inline and len(data) >= MIN_COMPRESS_SIZE and self.media_type.startswith(COMPRESSIBLE_TYPES):
+            compressed = gzip.compress(data, compresslevel=9, mtime=0)
+            if len(compressed) < len(data):
+                self.gzip = compressed
+            if brotli is not None:
+                compressed = brotli.compress(data)
+                if len(compressed) < len(data):
+                    self.br = compressed
+
+    def response(self, request: Request) -> Response:
+        headers = {"ETag": self.etag, "Cache-Control": self.cache_control}
+        if self.gzip is not None or self.br is not None:
+            headers["Vary"] = "Accept-Encoding"
+
+        if request.headers.get("if-none-match") == self.etag:
+            return Response(status_code=304, headers=headers)
+
+        if self.body is None:
+            return FileResponse(self.path, media_type=self.media_type, headers=headers, stat_result=self.stat)
+
+        body = self.body
+        accept_encoding = request.headers.get("accept-encoding", "")
+        if self.br is not None and "br" in accept_encoding:
+            body = self.br
+            headers["Content-Encoding"] = "br"
+        elif self.gzip is not None and "gzip" in accept_encoding:
+            body = self.gzip
+            headers["Content-Encoding"] = "gzip"
+
+        return Response(body, media_type=self.media_type, headers=headers)
+
+
+class AssetManifest:
+    """Индекс статических файлов: относительный путь -> Asset"""
+
+    def __init__(self, root: str):
+        self.root = root
+        self._assets = {}
+        self._by_name = {}
+        self.index: Optional[Asset] = None
+
+    def build(self):
+        assets = {}
+        by_name = {}
+
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                relative = os.path.relpath(path, self.root).replace(os.sep, "/")
+                stat = os.stat(path)
+                with open(path, "rb") as f:
+                    data = f.read()
+
+                asset = Asset(
+                    path, data, stat,
+                    immutable=relative.startswith(BUILD_ASSETS_DIR) and bool(HASHED_NAME_RE.search(filename)),
+                    inline=stat.st_size <= INLINE_LIMIT,
+                )
+                assets[relative] = asset
+                # Файлы из public/ лежат в корне dist, но могут запрашиваться как /assets/<имя>
+                by_name.setdefault(filename, asset)
+
+        self._assets = assets
+        self._by_name = by_name
+        self.index = assets.get("index.html")
+
+    def find(self, path: str) -> Optional[Asset]:
+        asset = self._assets.get(path)
+        if asset is None:
+            asset = self._by_name.get(path.rsplit("/", 1)[-1])
+        return asset
+
+    def __len__(self):
+        return len(self._assets)
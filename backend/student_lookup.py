@@ -0,0 +1,94 @@
+from typing import Optional
+from fastapi import Request
+from sqlalchemy import select, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import Student, StudentEmail
+import versioning
+
+# Связь пользователя со студентом.
+# Первое разрешение email ищет студента в students и запоминает результат
+# в таблице student_emails, найденный логин кладётся в сессию — дальше
+# студент достаётся одним поиском по первичному ключу.
+
+
+async def _match_student(email: str, db: AsyncSession) -> Optional[Student]:
+    # Пытаемся найти по логину (часть email до @)
+    login_from_email = email.split('@')[0]
+    student = await db.get(Student, login_from_email)
+    if student:
+        return student
+
+    # Пытаемся найти логин, содержащий часть email
+    result = await db.execute(
+        select(Student)
+        .where(func.lower(Student.login).contains(login_from_email.lower(), autoescape=True))
+        .order_by(Student.login)
+        .limit(1)
+    )
+    return result.scalars().first()
+
+
+async def find_student_by_email(email: str, db: AsyncSession) -> Optional[Student]:
+    """Находит студента по email пользователя"""
+    if not email:
+        return None
+
+    email = email.strip().lower()
+    version = await versioning.current(db)
+
+    link = await db.get(StudentEmail, email)
+    if link:
+        if link.student_login:
+            student = await db.get(Student, link.student_login)
+            if student:
+                return student
+        elif link.data_version == version:
+            # Студента нет, и данные с тех пор не менялись
+            return None
+
+    student = await _match_student(email, db)
+
+    if link is None:
+        link = StudentEmail(email=email)
+        db.add(link)
+    login = student.login if student else None
+    link.student_login = login
+    link.data_version = version
+
+    try:
+        await db.commit()
+    except IntegrityError:
+        # Параллельный запрос уже записал соответствие; откат сбрасывает объекты сессии
+        await db.rollback()
+        student = await db.get(Student, login) if login else None
+
+    return student
+
+
+async def get_session_student(request: Request, db: AsyncSession) -> Optional[Student]:
+    """Студент текущего пользователя; логин запоминается в сессии"""
+    user_info = request.session.get("user_info")
+    if not user_info:
+        return None
+
+    login = user_info.get("student_login")
+    if login:
+        student = await db.get(Student, login)
+        if student:
+            return student
+
+    student = await find_student_by_email(user_info.get("email", ""), db)
+    remember_student(request, student)
+    return student
+
+
+def remember_student(request: Request, student: Optional[Student]):
+    """Сохраняет связь пользователя со студентом в сессии"""
+    user_info = request.session.get("user_info")
+    if user_info is None:
+        return
+
+    login = student.login if student else None
+    if user_info.get("student_login") != login:
+        request.session["user_info"] = {**user_info, "student_login": login}
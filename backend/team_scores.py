@@ -0,0 +1,111 @@
+from itertools import chain
+from sqlalchemy import event, select, insert, delete, func, and_, inspect
+from sqlalchemy.orm import Session
+from models import Student, Team, Membership, TeamScore
+import versioning
+
+# Рейтинг команд.
+# Баллы команды — агрегат study_score её участников (наставники не
+# учитываются), хранится в team_scores. Агрегат пересчитывается только для
+# затронутых команд: при изменении баллов участника или состава через ORM —
+# в той же транзакции (after_flush), при загрузке выгрузки — целиком
+# в транзакции переноса (ingest.py). Запросы читают готовые значения.
+
+STUDENT_ROLE = "Студент"
+MENTOR_ROLE = "Наставник"
+
+# Имя версии данных состава команд (см. versioning.py)
+TEAMS = "teams"
+
+# Ограничение числа параметров в IN (...) для SQLite
+_CHUNK = 500
+
+
+def _aggregate():
+    return (
+        select(
+            Team.team_id,
+            func.count(Student.login),
+            func.coalesce(func.sum(Student.study_score), 0.0),
+            func.avg(Student.study_score),
+        )
+        .select_from(Team)
+        .outerjoin(Membership, and_(Membership.team_id == Team.team_id, Membership.rol == STUDENT_ROLE))
+        .outerjoin(Student, Student.login == Membership.student_login)
+        .group_by(Team.team_id)
+    )
+
+
+def refresh_team_scores(conn, team_ids=None):
+    """Пересчитывает агрегаты команд team_ids (или всех) в текущей транзакции"""
+    columns = ["team_id", "member_count", "score_sum", "score_avg"]
+    if team_ids is None:
+        conn.execute(delete(TeamScore))
+        conn.execute(insert(TeamScore).from_select(columns, _aggregate()))
+        return
+
+    team_ids = list(team_ids)
+    for start in range(0, len(team_ids), _CHUNK):
+        chunk = team_ids[start:start + _CHUNK]
+        conn.execute(delete(TeamScore).where(TeamScore.team_id.in_(chunk)))
+        conn.execute(insert(TeamScore).from_select(
+            columns, _aggregate().where(Team.team_id.in_(chunk))
+        ))
+
+
+def ensure_team_scores(conn):
+    """Досчитывает агрегаты команд, добавленных в обход ORM (синхронное соединение)"""
+    missing = conn.execute(
+        select(Team.team_id).where(Team.team_id.not_in(select(TeamScore.team_id)))
+    ).scalars().all()
+    if missing:
+        refresh_team_scores(conn, missing)
+
+
+def _teams_of(conn, logins):
+    team_ids = set()
+    logins = list(logins)
+    for start in range(0, len(logins), _CHUNK):
+        team_ids.update(conn.execute(
+            select(Membership.team_id).where(Membership.student_login.in_(logins[start:start + _CHUNK]))
+        ).scalars())
+    return team_ids
+
+
+@event.listens_for(Session, "after_flush")
+def _track_team_changes(session, flush_context):
+    logins = set()
+    team_ids = set()
+
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, Student):
+            state = inspect(obj)
+            if obj in session.dirty and not state.attrs.study_score.history.has_changes() \
+                    and not state.attrs.login.history.has_changes():
+                continue
+            logins.add(obj.login)
+        elif isinstance(obj, (Membership, Team)):
+            team_ids.add(obj.team_id)
+            # Участника перевели в другую команду — пересчитываем и старую
+            team_ids.update(inspect(obj).attrs.team_id.history.deleted)
+
+    if not logins and not team_ids:
+        return
+
+    connection = session.connection()
+    if logins:
+        team_ids |= _teams_of(connection, logins)
+    team_ids.discard(None)
+    if not team_ids:
+        return
+
+    refresh_team_scores(connection, team_ids)
+    if "teams_version" not in session.info:
+        session.info["teams_version"] = versioning.bump(connection, TEAMS)
+    session.info.pop(versioning.SESSION_VERSIONS, None)
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _reset_team_version(session):
+    session.info.pop("teams_version", None)
@@ -0,0 +1,173 @@
+"""
+Фоновое обновление OAuth-токенов пользователей.
+
+Раз в TOKEN_REFRESH_INTERVAL секунд (со случайным разбросом) выбираются
+пользователи, чей access_token истекает в ближайшие TOKEN_REFRESH_AHEAD
+секунд, и их токены обновляются по refresh_token параллельно, не больше
+TOKEN_REFRESH_CONCURRENCY запросов к серверу ТПУ одновременно. Так вход
+после истечения токена не требует полного круга через oauth.tpu.ru.
+
+Обновление запускается в каждом воркере uvicorn; пользователя забирает тот
+воркер, чьё условное UPDATE по updated_at прошло первым, поэтому одноразовый
+refresh_token не отправляется дважды. Один проход вручную, например против
+локальной заглушки (oauth_stub.py, TPU_TOKEN_URL в .env):
+
+    python backend/token_refresh.py
+"""
+import asyncio
+import logging
+import random
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Optional
+from fastapi import HTTPException
+from sqlalchemy import select, update
+from database import SessionLocal, engine
+from models import User
+from tpu_oauth import TPUOAuthService
+from user_cache import user_cache
+from config import settings
+
+# Итоги обновления для метрик
+SUCCESS = "success"
+REJECTED = "rejected"  # сервер отклонил refresh_token — пользователь войдёт заново
+ERROR = "error"  # сервер недоступен или ответил ошибкой — повтор на следующем проходе
+SKIPPED = "skipped"  # пользователя забрал другой воркер или он вошёл заново
+
+logger = logging.getLogger(__name__)
+
+
+class TokenRefresher:
+    def __init__(self):
+        self.results = Counter()
+        self.last_run: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    # --- ФОНОВЫЙ ЗАПУСК ---
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _jittered(self, seconds: float) -> float:
+        jitter = settings.TOKEN_REFRESH_JITTER
+        return seconds * random.uniform(1 - jitter, 1 + jitter)
+
+    async def _run(self):
+        # Воркеры стартуют одновременно — разводим их проходы во времени
+        await asyncio.sleep(random.uniform(0, settings.TOKEN_REFRESH_INTERVAL * settings.TOKEN_REFRESH_JITTER))
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Обновление токенов: ошибка прохода")
+            await asyncio.sleep(self._jittered(settings.TOKEN_REFRESH_INTERVAL))
+
+    # --- ПРОХОД ---
+
+    async def _expiring(self):
+        horizon = datetime.utcnow() + timedelta(seconds=settings.TOKEN_REFRESH_AHEAD)
+        async with SessionLocal() as db:
+            result = await db.execute(
+                select(User.id, User.refresh_token, User.updated_at)
+                .where(User.token_expires < horizon, User.refresh_token.isnot(None))
+                .order_by(User.token_expires)
+                .limit(settings.TOKEN_REFRESH_BATCH)
+            )
+            return result.all()
+
+    async def _claim(self, user_id: str, updated_at: datetime) -> bool:
+        """Забирает пользователя себе: updated_at не изменился с момента выборки"""
+        async with SessionLocal() as db:
+            result = await db.execute(
+                update(User)
+                .where(User.id == user_id, User.updated_at == updated_at)
+                .values(updated_at=datetime.utcnow())
+            )
+            await db.commit()
+            return result.rowcount == 1
+
+    async def refresh_user(self, user_id: str, refresh_token: str, updated_at: datetime) -> str:
+        if not await self._claim(user_id, updated_at):
+            return SKIPPED
+
+        try:
+            token_data = await TPUOAuthService.refresh_access_token(refresh_token)
+        except HTTPException as e:
+            if e.status_code != 400:
+                return ERROR
+            # Отказ окончательный: больше не пробуем, токен получит следующий вход
+            token_data = None
+
+        values = {"updated_at": datetime.utcnow()}
+        if token_data is None:
+            values["refresh_token"] = None
+        else:
+            values["access_token"] = token_data.get("access_token")
+            values["refresh_token"] = token_data.get("refresh_token", refresh_token)
+            expires_in = token_data.get("expires_in", 86400)
+            values["token_expires"] = datetime.utcnow() + timedelta(seconds=expires_in)
+
+        async with SessionLocal() as db:
+            # Пользователь мог за это время войти заново — его новые токены не трогаем
+            result = await db.execute(
+                update(User)
+                .where(User.id == user_id, User.refresh_token == refresh_token)
+                .values(**values)
+            )
+            await db.commit()
+        if result.rowcount != 1:
+            return SKIPPED
+        user_cache.invalidate(user_id)
+        return SUCCESS if token_data is not None else REJECTED
+
+    async def run_once(self, spread: Optional[float] = None) -> Counter:
+        """Один проход: обновляет истекающие токены, возвращает итоги прохода"""
+        users = await self._expiring()
+        semaphore = asyncio.Semaphore(settings.TOKEN_REFRESH_CONCURRENCY)
+        if spread is None:
+            spread = settings.TOKEN_REFRESH_INTERVAL * settings.TOKEN_REFRESH_JITTER
+
+        async def refresh(user):
+            # Запросы пачки размазаны по времени, а не уходят одним залпом
+            await asyncio.sleep(random.uniform(0, spread))
+            async with semaphore:
+                try:
+                    return await self.refresh_user(*user)
+                except Exception:
+                    logger.exception("Обновление токенов: пользователь %s", user.id)
+                    return ERROR
+
+        results = Counter(await asyncio.gather(*(refresh(user) for user in users)))
+        self.results.update(results)
+        self.last_run = time.time()
+        return results
+
+
+token_refresher = TokenRefresher()
+
+
+async def main():
+    try:
+        results = await token_refresher.run_once(spread=0)
+    finally:
+        await TPUOAuthService.close()
+        await engine.dispose()
+    print(", ".join(f"{outcome}: {count}" for outcome, count in sorted(results.items())) or "Нет истекающих токенов")
+    return 1 if results[ERROR] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -1,26 +1,90 @@
-import requests
+import asyncio
+import random
 import secrets
+import time
+from typing import Optional
+from urllib.parse import urlencode, quote
+import httpx
 from fastapi import HTTPException
 from config import settings
 
+# Ответы, после которых запрос имеет смысл повторить
+RETRY_STATUSES = {429, 502, 503, 504}
+# Из них те, при которых сервер точно не обработал запрос — их можно повторить и для неидемпотентных
+UNPROCESSED_STATUSES = {429, 503}
+
+
 class TPUOAuthService:
+    # Общий пул keep-alive соединений к oauth.tpu.ru / api.tpu.ru
+    _client: Optional[httpx.AsyncClient] = None
+
+    # Кэш данных пользователя: access_token -> (момент устаревания, данные)
+    _user_info_cache = {}
+    _user_info_cache_size = 1024
+
     @staticmethod
     def get_auth_url():
         """Генерация URL для авторизации через ТПУ"""
         state = secrets.token_urlsafe(16)
-        
+
         params = {
             "client_id": settings.TPU_CLIENT_ID,
             "redirect_uri": settings.TPU_REDIRECT_URI,
             "response_type": "code",
             "state": state
         }
-        
-        auth_url = f"{settings.TPU_AUTH_URL}?{requests.compat.urlencode(params)}"
+
+        auth_url = f"{settings.TPU_AUTH_URL}?{urlencode(params)}"
         return auth_url, state
-    
-    @staticmethod
-    def get_access_token(code: str):
+
+    @classmethod
+    def client(cls) -> httpx.AsyncClient:
+        """HTTP-клиент с общим пулом соединений и ограниченными таймаутами"""
+        if cls._client is None or cls._client.is_closed:
+            cls._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(
+                    settings.TPU_HTTP_TIMEOUT, connect=settings.TPU_HTTP_CONNECT_TIMEOUT
+                ),
+                limits=httpx.Limits(
+                    max_connections=settings.TPU_HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.TPU_HTTP_MAX_CONNECTIONS,
+                ),
+            )
+        return cls._client
+
+    @classmethod
+    async def close(cls):
+        if cls._client is not None:
+            await cls._client.aclose()
+            cls._client = None
+
+    @classmethod
+    async def _request(cls, method: str, url: str, idempotent: bool = True, **kwargs) -> httpx.Response:
+        """
+        Запрос с повторами и экспоненциальной задержкой.
+        Неидемпотентные запросы (обмен одноразового кода или refresh_token)
+        повторяются, только если запрос точно не дошёл до сервера: соединение
+        не установлено или сервер ответил 429/503.
+        """
+        retries = settings.TPU_HTTP_RETRIES
+        for attempt in range(retries + 1):
+            try:
+                response = await cls.client().request(method, url, **kwargs)
+                retry_statuses = RETRY_STATUSES if idempotent else UNPROCESSED_STATUSES
+                if response.status_code not in retry_statuses or attempt == retries:
+                    return response
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as e:
+                if attempt == retries:
+                    raise HTTPException(status_code=502, detail=f"Сервер ТПУ недоступен: {e}")
+            except httpx.TransportError as e:
+                if not idempotent or attempt == retries:
+                    raise HTTPException(status_code=502, detail=f"Сервер ТПУ недоступен: {e}")
+
+            delay = settings.TPU_HTTP_BACKOFF * (2 ** attempt)
+            await asyncio.sleep(delay * random.uniform(0.5, 1.5))
+
+    @classmethod
+    async def get_access_token(cls, code: str):
         """Получение access_token по коду авторизации"""
         data = {
             "client_id": settings.TPU_CLIENT_ID,
@@ -29,42 +93,80 @@ class TPUOAuthService:
             "code": code,
             "grant_type": "authorization_code"
         }
-        
-        try:
-            response = requests.post(settings.TPU_TOKEN_URL, data=data)
-            
-            if response.status_code != 200:
-                raise HTTPException(
-                    status_code=400, 
-                    detail=f"Ошибка получения токена: {response.text}"
-                )
-            
-            return response.json()
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=str(e))
-    
-    @staticmethod
-    def get_user_info(access_token: str):
+
+        response = await cls._request("POST", settings.TPU_TOKEN_URL, idempotent=False, data=data)
+
+        if response.status_code != 200:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Ошибка получения токена: {response.text}"
+            )
+
+        return response.json()
+
+    @classmethod
+    async def refresh_access_token(cls, refresh_token: str):
+        """
+        Новый access_token по refresh_token.
+        400 — сервер отклонил refresh_token (нужен новый вход), 502 — сервер недоступен.
+        """
+        data = {
+            "client_id": settings.TPU_CLIENT_ID,
+            "client_secret": settings.TPU_CLIENT_SECRET,
+            "refresh_token": refresh_token,
+            "grant_type": "refresh_token"
+        }
+
+        # refresh_token одноразовый: повтор дошедшего запроса получил бы отказ
+        response = await cls._request("POST", settings.TPU_TOKEN_URL, idempotent=False, data=data)
+
+        if response.status_code in (400, 401):
+            raise HTTPException(
+                status_code=400,
+                detail=f"Ошибка обновления токена: {response.text}"
+            )
+        if response.status_code != 200:
+            raise HTTPException(
+                status_code=502,
+                detail=f"Сервер ТПУ недоступен: {response.status_code}"
+            )
+
+        return response.json()
+
+    @classmethod
+    async def get_user_info(cls, access_token: str):
         """Получение информации о пользователе"""
+        cached = cls._user_info_cache.get(access_token)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+
         params = {
             "apiKey": settings.TPU_API_KEY,
             "access_token": access_token
         }
-        
-        try:
-            response = requests.get(settings.TPU_USER_INFO_URL, params=params)
-            
-            if response.status_code != 200:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Ошибка получения данных пользователя: {response.text}"
-                )
-            
-            return response.json()
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=str(e))
-    
+
+        response = await cls._request("GET", settings.TPU_USER_INFO_URL, params=params)
+
+        if response.status_code != 200:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Ошибка получения данных пользователя: {response.text}"
+            )
+
+        user_info = response.json()
+        cls._cache_user_info(access_token, user_info)
+        return user_info
+
+    @classmethod
+    def _cache_user_info(cls, access_token: str, user_info: dict):
+        cache = cls._user_info_cache
+        cache.pop(access_token, None)
+        cache[access_token] = (time.monotonic() + settings.TPU_USER_INFO_TTL, user_info)
+        # Словарь хранит порядок вставки — вытесняем самые старые записи
+        while len(cache) > cls._user_info_cache_size:
+            del cache[next(iter(cache))]
+
     @staticmethod
     def get_logout_url(redirect_url: str):
         """Генерация URL для выхода"""
-        return f"{settings.TPU_LOGOUT_URL}?redirect={requests.compat.quote(redirect_url)}"
+        return f"{settings.TPU_LOGOUT_URL}?redirect={quote(redirect_url)}"
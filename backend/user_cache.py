@@ -0,0 +1,57 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+from config import settings
+from models import User
+
+
+class UserCache:
+    """
+    LRU-кэш пользователей по id с ограниченным временем жизни.
+    Хранятся значения колонок, а не ORM-объект: объект сессии одного запроса
+    нельзя отдавать другим. Запись сбрасывается явно при входе, выходе и
+    обновлении токенов (routes/auth.py), TTL ограничивает устаревание
+    в остальных случаях — например, при правке из другого процесса.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: str) -> Optional[User]:
+        """Копия пользователя, не привязанная к сессии; изменять — через db.get"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] < time.monotonic():
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+        return User(**entry[1])
+
+    def put(self, user: User):
+        values = {column.key: getattr(user, column.key) for column in User.__table__.columns}
+        with self._lock:
+            self._entries.pop(user.id, None)
+            self._entries[user.id] = (time.monotonic() + self.ttl, values)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: Optional[str]):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+user_cache = UserCache(settings.USER_CACHE_SIZE, settings.USER_CACHE_TTL)
@@ -0,0 +1,142 @@
+from sqlalchemy import event, select, update, insert, inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from models import Student, DataVersion
+
+# Версия данных таблицы students хранится в data_versions и увеличивается
+# в той же транзакции, что и само изменение, поэтому любой кэш (в любом
+# процессе) может сравнить свою версию с текущей и понять, что устарел.
+#
+# Чтение версии дешёвое: в пределах сессии (одного запроса) версия читается
+# один раз, а на SQLite строка data_versions перечитывается, только если
+# PRAGMA data_version соединения показывает коммит из другого соединения
+# (другого воркера, ingest.py) с прошлого чтения.
+
+STUDENTS = "students"
+
+# Маркер удалённого студента в списке изменений
+DELETED = object()
+
+_listeners = []
+
+
+# Ключи info: версии, прочитанные сессией; версии соединения при PRAGMA data_version;
+# признак записи версии соединением в текущей транзакции
+SESSION_VERSIONS = "data_versions"
+CONNECTION_VERSIONS = "data_versions_gate"
+CONNECTION_WROTE = "data_versions_written"
+
+
+async def current(db: AsyncSession, name: str = STUDENTS) -> int:
+    """Текущая версия данных"""
+    session_versions = db.sync_session.info.setdefault(SESSION_VERSIONS, {})
+    if name in session_versions:
+        return session_versions[name]
+
+    conn = await db.connection()
+    gate = None
+    if conn.dialect.name == "sqlite" and not conn.info.get(CONNECTION_WROTE):
+        # Свои коммиты PRAGMA data_version не меняют — их отслеживает bump()
+        marker = (await conn.exec_driver_sql("PRAGMA data_version")).scalar()
+        gate = conn.info.get(CONNECTION_VERSIONS)
+        if gate is None or gate[0] != marker:
+            gate = conn.info[CONNECTION_VERSIONS] = (marker, {})
+
+    if gate is not None and name in gate[1]:
+        version = gate[1][name]
+    else:
+        version = (await conn.execute(
+            select(DataVersion.version).where(DataVersion.name == name)
+        )).scalar() or 0
+        if gate is not None:
+            gate[1][name] = version
+
+    session_versions[name] = version
+    return version
+
+
+def bump(connection, name: str = STUDENTS) -> int:
+    """Увеличивает версию данных в текущей транзакции и возвращает новую"""
+    connection.info.pop(CONNECTION_VERSIONS, None)
+    connection.info[CONNECTION_WROTE] = True
+    result = connection.execute(
+        update(DataVersion)
+        .where(DataVersion.name == name)
+        .values(version=DataVersion.version + 1)
+    )
+    if result.rowcount == 0:
+        connection.execute(insert(DataVersion).values(name=name, version=1))
+
+    return connection.execute(
+        select(DataVersion.version).where(DataVersion.name == name)
+    ).scalar_one()
+
+
+def on_change(callback):
+    """Регистрирует обработчик callback(version, changes).
+
+    changes — словарь {login: study_score | DELETED} или None, если
+    изменился весь набор данных и кэш нужно перестроить целиком.
+    """
+    _listeners.append(callback)
+    return callback
+
+
+def notify(version: int, changes=None):
+    """Оповещает подписчиков о новой версии данных"""
+    for callback in _listeners:
+        callback(version, changes)
+
+
+@event.listens_for(Session, "after_flush")
+def _track_student_changes(session, flush_context):
+    changes = {}
+
+    for obj in session.new:
+        if isinstance(obj, Student):
+            changes[obj.login] = obj.study_score
+
+    for obj in session.dirty:
+        if isinstance(obj, Student) and session.is_modified(obj):
+            # При смене логина старую запись нужно убрать из индексов
+            for old_login in inspect(obj).attrs.login.history.deleted:
+                changes[old_login] = DELETED
+            changes[obj.login] = obj.study_score
+
+    for obj in session.deleted:
+        if isinstance(obj, Student):
+            changes[obj.login] = DELETED
+
+    if not changes:
+        return
+
+    session.info.setdefault("student_changes", {}).update(changes)
+    session.info.pop(SESSION_VERSIONS, None)
+    # Версию увеличиваем один раз на транзакцию
+    if "students_version" not in session.info:
+        session.info["students_version"] = bump(session.connection())
+
+
+@event.listens_for(Session, "after_commit")
+def _notify_after_commit(session):
+    session.info.pop(SESSION_VERSIONS, None)
+    version = session.info.pop("students_version", None)
+    changes = session.info.pop("student_changes", None)
+    if version is not None:
+        notify(version, changes)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session):
+    session.info.pop(SESSION_VERSIONS, None)
+    session.info.pop("students_version", None)
+    session.info.pop("student_changes", None)
+
+
+@event.listens_for(Engine, "commit")
+@event.listens_for(Engine, "rollback")
+def _reset_connection_versions(connection):
+    # После своей записи версии соединения перечитываются из таблицы
+    if connection.info.pop(CONNECTION_WROTE, None):
+        connection.info.pop(CONNECTION_VERSIONS, None)
@@ -1,5 +1,5 @@
 // App.jsx
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { Header } from './components/Header/Header';
 import { Filters } from './components/Filters/Filters';
 import { Table } from './components/Table/Table';
@@ -60,9 +60,13 @@ export default function App() {
   };
 
   const fetchTeams = async () => {
-  const res = await fetch('/data/teams.json');
-  setTeams(await res.json());
-};
+    try {
+      const response = await axios.get(`${API_BASE_URL}/api/teams`);
+      setTeams(response.data);
+    } catch (err) {
+      console.error('Ошибка загрузки команд:', err);
+    }
+  };
 
   const fetchMentors = async () => {
     const res = await fetch('/data/mentors.json');
@@ -101,16 +105,11 @@ export default function App() {
 
   const fetchFilters = async () => {
     try {
-      const response = await axios.get(`${API_BASE_URL}/api/leaderboard`, {
-        params: { min_score: 0, max_score: 300 }
-      });
-      const data = response.data;
+      const response = await axios.get(`${API_BASE_URL}/api/leaderboard/facets`);
+      const { schools, groups } = response.data;
 
-      const uniqueSchools = [...new Set(data.map(s => s.Школа).filter(Boolean))];
-      const uniqueGroups = [...new Set(data.map(s => s.Группа).filter(Boolean))];
-
-      setSchools(uniqueSchools);
-      setGroups(uniqueGroups);
+      setSchools(schools.map(facet => facet.value));
+      setGroups(groups.map(facet => facet.value));
     } catch (err) {
       console.error('Ошибка загрузки фильтров:', err);
     }
@@ -147,6 +146,7 @@ export default function App() {
       // Загружаем достижения (доступны даже для неавторизованных)
       try {
         const achievementsResponse = await axios.get(`${API_BASE_URL}/api/achievements`, {
+          params: { limit: 3 },
           withCredentials: true
         });
         setAchievements(achievementsResponse.data || []);
@@ -220,6 +220,43 @@ export default function App() {
     return () => clearTimeout(timeoutId);
   }, [search, schoolFilter, groupFilter, minScore, maxScore, sortBy, sortOrder]);
 
+  // Актуальные загрузчик и сортировка для обработчиков потока изменений
+  const streamState = useRef({});
+  streamState.current = { fetchStudents, sortBy, sortOrder };
+
+  // Поток изменений рейтинга: места и баллы обновляются без перезагрузки таблицы
+  useEffect(() => {
+    const source = new EventSource(`${API_BASE_URL}/api/leaderboard/stream`);
+
+    source.addEventListener('diff', (event) => {
+      const { changes } = JSON.parse(event.data);
+      const { fetchStudents, sortBy, sortOrder } = streamState.current;
+
+      // Студент добавлен или удалён — меняется состав таблицы, загружаем заново
+      if (changes.some(([, oldRank, newRank]) => oldRank === null || newRank === null)) {
+        fetchStudents();
+        return;
+      }
+
+      const updates = new Map(changes.map(([login, , rank, score]) => [login, { rank, score }]));
+      setStudents(prev => {
+        const next = prev.map(student => {
+          const update = updates.get(student.login);
+          return update ? { ...student, Место: update.rank, Счет_баллов: update.score ?? 0 } : student;
+        });
+        if (sortBy === 'score') {
+          next.sort((a, b) => sortOrder === 'desc' ? a.Место - b.Место : b.Место - a.Место);
+        }
+        return next;
+      });
+    });
+
+    // Изменений слишком много или пропущены версии — загружаем таблицу заново
+    source.addEventListener('reset', () => streamState.current.fetchStudents());
+
+    return () => source.close();
+  }, []);
+
   const onReset = () => {
     setSearch('');
     setSchoolFilter('');
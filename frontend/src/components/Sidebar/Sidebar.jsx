@@ -16,6 +16,43 @@ function getScoreLabel(score) {
   return "баллов";
 }
 
+function pluralize(n, one, few, many) {
+  const lastDigit = n % 10;
+  const lastTwoDigits = n % 100;
+
+  if (lastTwoDigits >= 11 && lastTwoDigits <= 19) {
+    return many;
+  }
+  if (lastDigit === 1) {
+    return one;
+  }
+  if (lastDigit >= 2 && lastDigit <= 4) {
+    return few;
+  }
+  return many;
+}
+
+// createdAt приходит в UTC без указания зоны
+function getTimeAgo(createdAt) {
+  const minutes = Math.floor((Date.now() - new Date(createdAt + "Z").getTime()) / 60000);
+
+  if (minutes < 1) {
+    return "только что";
+  }
+  if (minutes < 60) {
+    return `${minutes} ${pluralize(minutes, "минуту", "минуты", "минут")} назад`;
+  }
+  const hours = Math.floor(minutes / 60);
+  if (hours < 24) {
+    return `${hours} ${pluralize(hours, "час", "часа", "часов")} назад`;
+  }
+  const days = Math.floor(hours / 24);
+  if (days === 1) {
+    return "вчера";
+  }
+  return `${days} ${pluralize(days, "день", "дня", "дней")} назад`;
+}
+
 export function Sidebar({ user, userRank, topWeekly, achievements }) {
   return (
     <div className="sidebar">
@@ -68,8 +105,8 @@ export function Sidebar({ user, userRank, topWeekly, achievements }) {
         <h3 className="sidebar-title">Последние достижения</h3>
         <div className="achievements-list">
           {achievements && achievements.length > 0 ? (
-            achievements.map((achievement, index) => (
-              <div key={index} className="achievement-item">
+            achievements.map((achievement) => (
+              <div key={achievement.id} className="achievement-item">
                 <div className={`achievement-icon achievement-${achievement.type}`}>
                   {achievement.type === 'position' && '⬆️'}
                   {achievement.type === 'badge' && '🎖️'}
@@ -77,7 +114,7 @@ export function Sidebar({ user, userRank, topWeekly, achievements }) {
                 </div>
                 <div className="achievement-content">
                   <div className="achievement-text">{achievement.text}</div>
-                  <div className="achievement-time">{achievement.time}</div>
+                  <div className="achievement-time">{getTimeAgo(achievement.createdAt)}</div>
                 </div>
               </div>
             ))